@@ -1,36 +1,65 @@
+import asyncio
 import gradio as gr
-import json
-from generators.scatter_generator import ScatterGenerator
-from generators.pie_generator import PieGenerator
-from generators.bar_generator import BarGenerator
-from generators.line_generator import LineGenerator
-from generators.area_generator import AreaGenerator
-from generators.bubble_generator import BubbleGenerator
-from generators.choropleth_generator import ChoroplethGenerator
-from generators.stackedarea_generator import StackedAreaGenerator
-from generators.stackedbar_generator import StackedBarGenerator
-from generators.treemap_generator import TreeMapGenerator
-from generators.histogram_generator import HistogramGenerator
-from generators.stacked100_generator import Stacked100Generator
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from generators.cache import RenderCache
+from generators import qa, registry
+from generators.sinks import MemorySink
 import os
 
-generators = {
-    "Area Chart": AreaGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Bar Chart": BarGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Bubble Chart": BubbleGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Choropleth Map": ChoroplethGenerator(output_dir="./charts", img_format="png", width=700, height=500),
-    "Line Chart": LineGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Pie Chart": PieGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Scatter Chart": ScatterGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Stacked Area Chart": StackedAreaGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Stacked Bar Chart": StackedBarGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "Treemap": TreeMapGenerator(output_dir="./charts", img_format="png", width=500, height=500),
-    "Histogram": HistogramGenerator(output_dir="./charts", img_format="png", width=300, height=300),
-    "100% Stacked Bar Chart": Stacked100Generator(output_dir="./charts", img_format="png", width=300, height=300)
-}
-
-def generate_chart(chart_type, seed, num_items, x_label, y_label, size_label, title, categories, series):
-    kwargs = {
+chart_types = registry.labels()
+
+generators = {}
+generators_lock = threading.Lock()
+
+def get_generator(chart_type):
+    with generators_lock:
+        if chart_type not in generators:
+            generators[chart_type] = registry.create(chart_types[chart_type], output_dir="./charts", img_format="png")
+        return generators[chart_type]
+
+render_cache = RenderCache(cache_dir="./charts/cache", max_bytes=512 * 1024 * 1024)
+
+# Renders run on a small thread pool so the event loop never blocks on an export.
+# At most RENDER_WORKERS renders run at once and RENDER_QUEUE_DEPTH more may wait;
+# anything beyond that is turned away immediately instead of queueing behind them.
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", 2))
+RENDER_QUEUE_DEPTH = int(os.environ.get("RENDER_QUEUE_DEPTH", 8))
+RENDER_TIMEOUT = float(os.environ.get("RENDER_TIMEOUT", 60))
+
+render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+render_slots = threading.BoundedSemaphore(RENDER_WORKERS + RENDER_QUEUE_DEPTH)
+
+async def generate_chart(chart_type, seed, num_items, x_label, y_label, size_label, title, categories, series):
+    if chart_type not in chart_types:
+        return None, "Unsupported chart type."
+    key = render_cache.key(chart_type=chart_type, seed=seed, num_items=num_items,
+                           x_label=x_label, y_label=y_label, size_label=size_label, title=title,
+                           categories=categories, series=series)
+    entry = render_cache.get(key)
+    if entry is not None:
+        return entry
+
+    if not render_slots.acquire(blocking=False):
+        raise gr.Error("The renderer is busy, please try again in a moment.")
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        render_pool,
+        lambda: render_cache.get_or_render(
+            key,
+            lambda: render_chart(chart_type, seed, num_items, x_label, y_label, size_label, title, categories, series)
+        )
+    )
+    # A render can't be interrupted once started, so the slot is held until it really finishes
+    future.add_done_callback(lambda _: render_slots.release())
+    try:
+        # shield() keeps a timed-out render running so its result still lands in the cache
+        return await asyncio.wait_for(asyncio.shield(future), RENDER_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise gr.Error(f"Rendering took longer than {RENDER_TIMEOUT:g}s, please try again.")
+
+def chart_kwargs(x_label, y_label, size_label, title, categories, series):
+    return {
         "x_label": x_label,
         "y_label": y_label,
         "size_label": size_label,
@@ -39,66 +68,56 @@ def generate_chart(chart_type, seed, num_items, x_label, y_label, size_label, ti
         "series": series.split(",")
     }
 
-    generator = generators[chart_type]
-    if chart_type == "Pie Chart":
-        filename = generator.generate(seed=seed, num_slices=num_items, **kwargs)
-    elif chart_type == "Scatter Chart":
-        filename = generator.generate(seed=seed, num_points=num_items, **kwargs)
-    elif chart_type == "Bar Chart":
-        filename = generator.generate(seed=seed, num_bars=num_items, **kwargs)
-    elif chart_type == "Area Chart":
-        filename = generator.generate(seed=seed, num_points=num_items, **kwargs)
-    elif chart_type == "Bubble Chart":
-        filename = generator.generate(seed=seed, num_points=num_items, **kwargs)
-    elif chart_type == "Line Chart":
-        filename = generator.generate(seed=seed, num_points=num_items, **kwargs)
-    elif chart_type == "Choropleth Map":
-        filename = generator.generate(seed=seed, **kwargs)
-    elif chart_type == "Stacked Area Chart":
-        filename = generator.generate(seed=seed, num_points=num_items, **kwargs)
-    elif chart_type == "Stacked Bar Chart":
-        filename = generator.generate(seed=seed, num_categories=num_items, **kwargs)
-    elif chart_type == "Treemap":
-        filename = generator.generate(seed=seed, num_categories=num_items, **kwargs)
-    elif chart_type == "Histogram":
-        filename = generator.generate(seed=seed, num_bins=num_items, **kwargs)
-    elif chart_type == "100% Stacked Bar Chart":
-        filename = generator.generate(seed=seed, num_categories=num_items, **kwargs)
-    else:
-        return None, "Unsupported chart type."
+def render_chart(chart_type, seed, num_items, x_label, y_label, size_label, title, categories, series):
+    kwargs = chart_kwargs(x_label, y_label, size_label, title, categories, series)
 
-    img_path = os.path.join(generator.output_dir, f"{filename}.png")
-    json_path = os.path.join(generator.output_dir, f"{filename}.json")
-    return img_path, json_path
+    # Rendered into memory and handed to render_cache, which keeps the only copy on disk.
+    # A generator per render, so concurrent renders never share a sink.
+    sink = MemorySink()
+    generator = registry.create(chart_types[chart_type], output_dir="./charts", img_format="png", sink=sink)
+    generator.generate(seed=seed, **generator.size_kwargs(num_items), **kwargs)
 
+    files = {ext: data for _, ext, data in sink.drain()}
+    return files["png"], files["json"]
 
-def generate_qa(chart_type, question, options, answer):
-    QA_DIR = "./questions"
-    json_path = os.path.join(QA_DIR, f"{chart_type}.json")
-    opt = options.split(",")
-    opt_sel = []
-    for i, o in enumerate(opt):
-        sel = {
-            chr(65+i): o
-        }
-        opt_sel.append(sel)
-
-    qa = {
-        "type": chart_type,
-        "question": question,
-        "options": opt_sel,
-        "correct_answer": answer # A, B, C, D
-    }
 
-    with open(json_path, "w") as f:
-        json.dump(qa, f, indent=4)
-    return json_path
+def generate_qa(chart_type, question, options, answer, seed, num_items,
+                x_label, y_label, size_label, title, categories, series):
+    QA_DIR = "./questions"
+    qa_path = os.path.join(QA_DIR, f"{chart_type}.jsonl")
+    if not question:
+        # no question typed in: derive the full set from the chart's own data, drawn with the same inputs
+        generator = get_generator(chart_type)
+        kwargs = chart_kwargs(x_label, y_label, size_label, title, categories, series)
+        synth = generator.synthesize(seed=seed, **generator.size_kwargs(num_items), **kwargs)
+        rows = [dict(q, type=chart_type) for q in qa.questions(generator, synth, seed)]
+    else:
+        opt = options.split(",")
+        opt_sel = []
+        for i, o in enumerate(opt):
+            sel = {
+                chr(65+i): o
+            }
+            opt_sel.append(sel)
+
+        rows = [{
+            "type": chart_type,
+            "question": question,
+            "options": opt_sel,
+            "correct_answer": answer # A, B, C, D
+        }]
+
+    # appended, so earlier questions for the chart type are kept
+    store = qa.QAStore(qa_path)
+    store.write(rows)
+    store.close()
+    return qa_path
 
 with gr.Blocks() as demo:
     gr.Markdown("# 📊 Chart Generator")
 
     with gr.Row():
-        chart_type = gr.Dropdown(generators.keys(), label="Chart Type", value="Area Chart")
+        chart_type = gr.Dropdown(list(chart_types), label="Chart Type", value="Area Chart")
         seed = gr.Number(label="Random Seed", value=42, precision=0)
         num_items = gr.Slider(3, 10, value=4, step=1, label="Number of Items (Slices or Points)")
     
@@ -117,7 +136,7 @@ with gr.Blocks() as demo:
             img_output = gr.Image(label="Generated Chart")
         with gr.Column():
             json_output = gr.File(label="Download Metadata (.json)")
-            question_answer_json = gr.File(label="Download Qustion & Answer (.json)")
+            question_answer_json = gr.File(label="Download Qustion & Answer (.jsonl)")
 
     with gr.Row():
         question = gr.Textbox(label="Question")
@@ -136,15 +155,24 @@ with gr.Blocks() as demo:
         categories,
         series
         ],
-        outputs=[img_output, json_output]
+        outputs=[img_output, json_output],
+        # generate_chart applies its own limits through render_pool and render_slots
+        concurrency_limit=None
     )
 
     generate_qa_btn.click(
         fn=generate_qa,
-        inputs=[chart_type, question, options, answer],
+        inputs=[chart_type, question, options, answer, seed, num_items,
+        x_label,
+        y_label,
+        size_label,
+        title,
+        categories,
+        series
+        ],
         outputs=[question_answer_json]
     )
 
 
-
+demo.queue(max_size=RENDER_WORKERS + RENDER_QUEUE_DEPTH)
 demo.launch()
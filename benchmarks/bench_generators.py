@@ -0,0 +1,190 @@
+"""Per-generator, per-stage throughput benchmark.
+
+    python -m benchmarks.bench_generators --types all --seeds 0:50 --num-items 4,10 --output bench.json
+    python -m benchmarks.bench_generators --compare bench.json
+
+Each chart type runs in its own process, so peak RSS is that generator's alone.
+Stage times come from the generators.metrics hooks: synthesize (data), render
+(vl-convert / Kaleido), padding (_make_square_padding), save_chart (PNG encode
++ write) and save_metadata, plus build (spec/figure construction, i.e. whatever
+generate() does outside the other stages).
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import metadata
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+import numpy as np
+from generators import metrics, registry
+from generators.batch import parse_range
+from generators.sinks import MemorySink
+
+STAGES = ["synthesize", "render", "padding", "save_chart", "save_metadata"]
+PACKAGES = ["altair", "vl-convert-python", "plotly", "kaleido", "pillow", "pandas", "numpy"]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000
+    return {"mean_ms": float(ms.mean()), "p50_ms": float(np.percentile(ms, 50)),
+            "p99_ms": float(np.percentile(ms, 99)), "total_s": float(ms.sum() / 1000)}
+
+
+def bench_type(chart_type: str, seeds: List[int], sizes: List[Optional[int]], warmup: int,
+               sink: str) -> dict:
+    """Run one chart type over seeds x sizes; meant to run in a fresh process."""
+    rss_start = _peak_rss_mb()
+    with tempfile.TemporaryDirectory() as output_dir:
+        generator = registry.create(chart_type, output_dir=output_dir, img_format="png",
+                                    sink=MemorySink() if sink == "memory" else None)
+        if generator.size_param is None:
+            sizes = [None]
+
+        # renderer startup and first-call costs are reported separately
+        start = time.perf_counter()
+        for seed in range(warmup):
+            generator.generate(seed=seed, **generator.size_kwargs(sizes[0]))
+        warmup_s = time.perf_counter() - start
+
+        results = {}
+        timings: Dict[str, float] = {}
+
+        def hook(_, stage, seconds, error):
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+        metrics.add_hook(hook)
+        for num_items in sizes:
+            stages = {stage: [] for stage in STAGES + ["build", "generate"]}
+            start = time.perf_counter()
+            for seed in seeds:
+                timings.clear()
+                t0 = time.perf_counter()
+                generator.generate(seed=seed, **generator.size_kwargs(num_items))
+                total = time.perf_counter() - t0
+                if isinstance(generator.sink, MemorySink):
+                    generator.sink.drain()
+                for stage in STAGES:
+                    stages[stage].append(timings.get(stage, 0.0))
+                # generate covers every other stage; build is what it spends outside them
+                stages["build"].append(max(total - sum(timings.get(stage, 0.0) for stage in STAGES), 0.0))
+                stages["generate"].append(total)
+            elapsed = time.perf_counter() - start
+            results["default" if num_items is None else str(num_items)] = {
+                "images": len(seeds),
+                "images_per_s": len(seeds) / elapsed,
+                "stages": {stage: _summary(samples) for stage, samples in stages.items()},
+            }
+
+    return {"chart_type": chart_type, "backend": generator.backend, "warmup_s": warmup_s,
+            "rss_start_mb": rss_start, "peak_rss_mb": _peak_rss_mb(), "sizes": results}
+
+
+def _versions() -> Dict[str, Optional[str]]:
+    versions = {"python": platform.python_version()}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def run(chart_types: List[str], seeds: List[int], sizes: List[Optional[int]],
+        warmup: int = 2, sink: str = "files") -> dict:
+    results = []
+    for chart_type in chart_types:
+        # a fresh process per type keeps peak RSS and renderer state separate
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            try:
+                results.append(pool.submit(bench_type, chart_type, seeds, sizes, warmup, sink).result())
+            except Exception as e:
+                print(f"[bench] {chart_type} failed: {type(e).__name__}: {e}", file=sys.stderr)
+                results.append({"chart_type": chart_type, "error": f"{type(e).__name__}: {e}"})
+    return {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "versions": _versions(), "sink": sink,
+            "seeds": [seeds[0], seeds[-1] + 1] if seeds else [], "results": results}
+
+
+def print_report(report: dict):
+    print(f"{'chart type':<16}{'size':>8}{'img/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+          + "".join(f"{stage[:10]:>12}" for stage in ["build"] + STAGES) + f"{'RSS MB':>9}")
+    for result in report["results"]:
+        if "error" in result:
+            print(f"{result['chart_type']:<16}  {result['error']}")
+            continue
+        for size, r in result["sizes"].items():
+            stages = r["stages"]
+            print(f"{result['chart_type']:<16}{size:>8}{r['images_per_s']:>9.1f}"
+                  f"{stages['generate']['p50_ms']:>9.1f}{stages['generate']['p99_ms']:>9.1f}"
+                  + "".join(f"{stages[stage]['p50_ms']:>12.2f}" for stage in ["build"] + STAGES)
+                  + f"{result['peak_rss_mb']:>9.0f}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Chart type/size pairs whose throughput dropped more than `tolerance` below the baseline."""
+    before = {(r["chart_type"], size): s["images_per_s"]
+              for r in baseline["results"] if "error" not in r for size, s in r["sizes"].items()}
+    regressions = []
+    for result in report["results"]:
+        for size, s in result.get("sizes", {}).items():
+            old = before.get((result["chart_type"], size))
+            if old and s["images_per_s"] < old * (1 - tolerance):
+                regressions.append(f"{result['chart_type']}/{size}: {s['images_per_s']:.1f} img/s "
+                                   f"vs {old:.1f} img/s in the baseline")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chart generation per generator and stage.")
+    parser.add_argument("--types", default="all",
+                        help=f"comma separated chart types or 'all' ({', '.join(registry.names())})")
+    parser.add_argument("--seeds", default="0:20", help="seed range 'start:stop' or list 'a,b,c'")
+    parser.add_argument("--num-items", default=None,
+                        help="item counts 'start:stop' or 'a,b,c' (default: each generator's default)")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed generations before measuring")
+    parser.add_argument("--sink", choices=["files", "memory"], default="files",
+                        help="write to a temporary directory, or keep output in memory to leave out disk I/O")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    parser.add_argument("--compare", default=None, help="baseline JSON report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed img/s drop against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    if args.types == "all":
+        chart_types = registry.names()
+    else:
+        chart_types = [t.strip() for t in args.types.split(",") if t.strip()]
+        unknown = [t for t in chart_types if t not in registry.GENERATORS]
+        if unknown:
+            parser.error(f"unknown chart types: {', '.join(unknown)}")
+    sizes = parse_range(args.num_items) if args.num_items else [None]
+
+    report = run(chart_types, parse_range(args.seeds), sizes, args.warmup, args.sink)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"[bench] regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,62 +5,44 @@ import numpy as np
 import pandas as pd
 import altair as alt
 from typing import Optional, Dict, Any
+from generators import raster
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, value_table
 
 class BarGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200):
-        super().__init__(output_dir, img_format, width, height)
+    name = "bar"
+    size_param = "num_bars"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    backends = ("raster",)
+    qa_columns = ("Category", "Value")
 
-    def generate(self, seed: int = 0, num_bars: int = 4, 
-                 question_template: Optional[str] = "Which category has the highest value?",
-                 **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200,
+                 sink=None, backend: Optional[str] = None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, backend, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, num_bars: int = 4, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
 
-        x_label = kwargs.get("x_label") or "Category"
-        values_label = kwargs.get("y_label") or "Value"
-        title = kwargs.get("title") or f"Bar Chart of {values_label}"
         categories = kwargs.get("categories") or [chr(65+i) for i in range(num_bars)]
         if (len(categories) != num_bars):
             categories = [chr(65+i) for i in range(num_bars)]
 
-        values = [random.randint(10, 100) for _ in categories]
-        df = pd.DataFrame({'Category': categories, 'Value': values})
+        df = value_table(np_rng, categories, 10, 100)
 
-        color_scheme = random.choice(['category10', 'dark2'])
-        sort = random.choice([True, False])
-        orientation = random.choice(['vertical', 'horizontal'])
+        color_scheme = rng.choice(['category10', 'dark2'])
+        sort = rng.choice([True, False])
+        orientation = rng.choice(['vertical', 'horizontal'])
 
         if sort:
             df = df.sort_values('Value')
 
-        if orientation == 'vertical':
-            chart = alt.Chart(df).mark_bar().encode(
-                x=alt.X('Category', title=x_label, sort=None),
-                y=alt.Y("Value:Q", title=values_label),
-                color=alt.Color('Category', title=x_label, scale=alt.Scale(scheme=color_scheme))
-            )
-        else:
-            chart = alt.Chart(df).mark_bar().encode(
-                y=alt.Y('Category', title=x_label, sort=None),
-                x=alt.X('Value:Q', title=values_label),
-                color=alt.Color('Category', title=x_label, scale=alt.Scale(scheme=color_scheme))
-            )
-
-        chart = chart.properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
-
-        filename = f"BarChart"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(os.path.join(self.output_dir, 
-                                               f"{filename}.{self.img_format}"), 
-                                               size=self.width,
-                                               overlay_rgba=bgcolor)
-
         max_category = df.loc[df['Value'].idxmax(), 'Category']
-        metadata = {
-            "filename": f"{filename}.{self.img_format}",
-            "chart_type": "bar",
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
             "max_category": max_category,
             "variation": {
                 "color_scheme": color_scheme,
@@ -68,8 +50,56 @@ class BarGenerator(ChartGenerator):
                 "orientation": orientation,
                 "num_bars": num_bars
             },
-            "question": question_template,
             "answer": max_category
         }
+
+    def generate(self, seed: int = 0, num_bars: int = 4, 
+                 question_template: Optional[str] = "Which category has the highest value?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_bars=num_bars, **kwargs)
+        df = synth["data"]
+        color_scheme = synth["variation"]["color_scheme"]
+
+        x_label = kwargs.get("x_label") or "Category"
+        values_label = kwargs.get("y_label") or "Value"
+        title = kwargs.get("title") or f"Bar Chart of {values_label}"
+
+        def build(data):
+            if synth["variation"]["orientation"] == 'vertical':
+                chart = alt.Chart(data).mark_bar().encode(
+                    x=alt.X('Category', title=x_label, sort=None),
+                    y=alt.Y("Value:Q", title=values_label),
+                    color=alt.Color('Category', title=x_label, scale=alt.Scale(scheme=color_scheme))
+                )
+            else:
+                chart = alt.Chart(data).mark_bar().encode(
+                    y=alt.Y('Category', title=x_label, sort=None),
+                    x=alt.X('Value:Q', title=values_label),
+                    color=alt.Color('Category', title=x_label, scale=alt.Scale(scheme=color_scheme))
+                )
+
+            chart = chart.properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
+            return chart
+
+        if self.backend == "raster":
+            rendered = self._render_raster(raster.bar, df, self.width, self.height, title, x_label, values_label,
+                                           color_scheme, synth["variation"]["orientation"])
+        else:
+            rendered = self._render_chart(self._chart_spec(df, build, variation=synth["variation"],
+                                                           x_label=x_label, values_label=values_label, title=title))
+
+        filename = self._output_name("BarChart", seed,
+                                     num_bars=num_bars,
+                                     question_template=question_template, **kwargs)
+        self._save_images(rendered, filename, overlay_rgba=synth["bgcolor"])
+
+        metadata = {
+            "filename": f"{filename}.{self.img_format}",
+            "chart_type": "bar",
+            "max_category": synth["max_category"],
+            "variation": synth["variation"],
+            "question": question_template,
+            "answer": synth["answer"]
+        }
         self._save_metadata(metadata, filename)
         return filename
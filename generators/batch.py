@@ -0,0 +1,423 @@
+"""Headless batch generation of chart datasets.
+
+    python -m generators.batch --types all --seeds 0:100000 --workers 8 --output-dir ./dataset
+
+Split across machines, each node runs one part of the seed range and writes a
+manifest for it; the manifests are merged once every part is done:
+
+    python -m generators.batch --seeds 0:100000 --shard 3/8 --output-dir ./dataset
+    python -m generators.batch --merge ./dataset --output-dir ./dataset
+
+With --qa, multiple-choice questions about every chart (see generators.qa)
+are saved with it as <name>.qa.json, and appended to a JSONL file or Parquet
+parts that hold the questions of the whole run.
+"""
+import argparse
+import functools
+import glob
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import tarfile
+from multiprocessing import Pool
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from generators.generator import ChartGenerator
+from generators import metrics, qa, registry
+from generators.sinks import FileSink, HashingSink, MemorySink, TarShardSink, drop_samples
+
+PROGRESS_FILE = "progress.jsonl"
+MANIFEST_FILE = "manifest.jsonl"
+
+Part = Tuple[int, int]
+
+Job = Tuple[str, int, Optional[int]]
+
+# Per-worker generator instances and the options that go into job keys, filled in by _init_worker
+_generators: Dict[str, ChartGenerator] = {}
+_key_options: Dict[str, Any] = {}
+
+
+def parse_range(spec: str) -> List[int]:
+    """Parse "start:stop", "a,b,c" or a single integer."""
+    if ":" in spec:
+        start, stop = spec.split(":", 1)
+        return list(range(int(start), int(stop)))
+    return [int(s) for s in spec.split(",") if s]
+
+
+def parse_part(spec: str) -> Part:
+    """Parse "i/N", part i (0-based) of N."""
+    index, count = (int(v) for v in spec.split("/", 1))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"invalid shard {spec!r}, expected i/N with 0 <= i < N")
+    return index, count
+
+
+def part_seeds(seeds: List[int], part: Optional[Part]) -> List[int]:
+    # Every N-th seed, so parts get the same mix of work whatever the seed range
+    if part is None:
+        return seeds
+    index, count = part
+    return seeds[index::count]
+
+
+def part_suffix(part: Optional[Part]) -> str:
+    return "" if part is None else f"-{part[0]:05d}-of-{part[1]:05d}"
+
+
+def _part_file(name: str, part: Optional[Part]) -> str:
+    root, ext = os.path.splitext(name)
+    return f"{root}{part_suffix(part)}{ext}"
+
+
+def iter_jobs(chart_types: List[str], seeds: List[int],
+              sizes: List[Optional[int]]) -> Iterator[Job]:
+    # One backend after the other, so each chunk of jobs keeps a worker on a single warm renderer
+    for group in registry.by_backend(chart_types).values():
+        for seed in seeds:
+            for chart_type in group:
+                if registry.load(chart_type).size_param is None:
+                    yield (chart_type, seed, None)
+                    continue
+                for num_items in sizes:
+                    yield (chart_type, seed, num_items)
+
+
+def job_key(job: Job, backend: Optional[str] = None, image_sizes: Tuple[int, ...] = (),
+            with_qa: bool = False) -> str:
+    chart_type, seed, num_items = job
+    key = f"{chart_type}/{seed}" if num_items is None else f"{chart_type}/{seed}-{num_items}"
+    # Options that change what a job writes are part of its key, so a run never resumes
+    # from (or merges with) one made with other options; default runs keep plain keys
+    if backend in registry.load(chart_type).backends:
+        key += f";backend={backend}"
+    if image_sizes:
+        key += ";sizes=" + ",".join(map(str, image_sizes))
+    if with_qa:
+        key += ";qa"
+    return key
+
+
+def read_records(path: str) -> Dict[str, dict]:
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                records[record["key"]] = record
+            except (ValueError, KeyError):
+                # a torn last line from an interrupted run
+                continue
+    return records
+
+
+def load_progress(output_dir: str, part: Optional[Part] = None) -> set:
+    return set(read_records(os.path.join(output_dir, _part_file(PROGRESS_FILE, part))))
+
+
+def _sort_key(record: dict):
+    return record["chart_type"], record["seed"], record["num_items"] or 0, record["key"]
+
+
+def write_manifest(path: str, records: Iterable[dict]):
+    """Records sorted by (chart_type, seed, num_items, key), so equal runs give equal manifests."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        for record in sorted(records, key=_sort_key):
+            f.write(json.dumps(record, sort_keys=True) + "\n")
+    os.replace(tmp_path, path)
+
+
+def merge(dirs: List[str], output_dir: str) -> int:
+    """Merge the per-part manifests found in dirs into output_dir/manifest.jsonl."""
+    pattern = re.compile(r"manifest-(\d+)-of-(\d+)\.jsonl$")
+    parts: Dict[int, str] = {}
+    counts = set()
+    for directory in dirs:
+        for path in glob.glob(os.path.join(directory, "manifest-*-of-*.jsonl")):
+            m = pattern.search(os.path.basename(path))
+            if m:
+                parts[int(m.group(1))] = path
+                counts.add(int(m.group(2)))
+    if len(counts) != 1:
+        raise ValueError(f"expected manifests of a single split, found {sorted(counts) or 'none'}")
+    count = counts.pop()
+    missing = [i for i in range(count) if i not in parts]
+    if missing:
+        raise ValueError(f"missing manifests for parts {missing} of {count}")
+
+    records: Dict[str, dict] = {}
+    for index in sorted(parts):
+        for key, record in read_records(parts[index]).items():
+            if key in records and records[key] != record:
+                raise ValueError(f"{key} differs between parts")
+            records[key] = record
+    os.makedirs(output_dir, exist_ok=True)
+    write_manifest(os.path.join(output_dir, MANIFEST_FILE), records.values())
+    return len(records)
+
+
+def _init_worker(output_dir: str, chart_types: List[str], sink: str,
+                 trace: Optional[str] = None, metrics_file: Optional[str] = None, with_qa: bool = False,
+                 backend: Optional[str] = None, sizes: Tuple[int, ...] = ()):
+    _key_options.update(backend=backend, image_sizes=sizes, with_qa=with_qa)
+    if trace or metrics_file:
+        metrics.configure(trace, metrics_file)
+    for chart_type in chart_types:
+        # with tar output, workers hand their files back to the parent, which owns the shards
+        inner = MemorySink() if sink == "tar" else FileSink(output_dir)
+        # chart types without the requested backend keep their own
+        options = {"backend": backend} if backend in registry.load(chart_type).backends else {}
+        _generators[chart_type] = registry.create(chart_type, output_dir=output_dir, img_format="png",
+                                                  sink=HashingSink(inner), sizes=sizes, **options)
+
+
+def _run_job(job: Job) -> dict:
+    chart_type, seed, num_items = job
+    key = job_key(job, **_key_options)
+    generator = _generators[chart_type]
+    sink = generator.sink
+    try:
+        filename = generator.generate(seed=seed, **generator.size_kwargs(num_items))
+        image = f"{filename}.{generator.img_format}"
+        questions = None
+        if _key_options["with_qa"]:
+            # synthesize() is a pure function of its arguments, so this is the data just rendered
+            synth = generator.synthesize(seed=seed, **generator.size_kwargs(num_items))
+            questions = [dict(q, image=image, seed=seed) for q in qa.questions(generator, synth, seed)]
+            # part of the sample too, so a tar shard holds everything about its charts
+            sink.write(filename, "qa.json", json.dumps(questions, indent=2).encode("utf-8"))
+    except Exception as e:
+        sink.drain()
+        if isinstance(sink.sink, MemorySink):
+            sink.sink.drain()
+        return {"key": key, "error": f"{type(e).__name__}: {e}"}
+
+    result = {"key": key, "chart_type": chart_type, "seed": seed, "num_items": num_items,
+              "image": image, "metadata": f"{filename}.json", "sha256": sink.drain()}
+    if isinstance(sink.sink, MemorySink):
+        result["files"] = sink.sink.drain()
+    if questions is not None:
+        result["qa"] = questions
+    return result
+
+
+def _read_output(output_dir: str, record: dict, name: str) -> Optional[bytes]:
+    try:
+        if "shard" in record:
+            with tarfile.open(os.path.join(output_dir, record["shard"])) as tar:
+                return tar.extractfile(name).read()
+        with open(os.path.join(output_dir, name), "rb") as f:
+            return f.read()
+    except (OSError, KeyError, tarfile.TarError):
+        return None
+
+
+def _sample(record: dict) -> str:
+    return os.path.splitext(record["metadata"])[0]
+
+
+def verify(output_dir: str, records: List[dict], sample: int) -> List[str]:
+    """Re-hash a random sample of finished outputs; returns the keys whose files are missing or changed."""
+    bad = []
+    for record in random.sample(records, min(sample, len(records))):
+        # records written before hashes were kept can only be checked for presence
+        digests = record.get("sha256") or {record["image"]: None, record["metadata"]: None}
+        for name, digest in digests.items():
+            data = _read_output(output_dir, record, name)
+            if data is None or (digest is not None and hashlib.sha256(data).hexdigest() != digest):
+                bad.append(record["key"])
+                break
+    return bad
+
+
+def run(chart_types: List[str], seeds: List[int], sizes: List[Optional[int]],
+        output_dir: str, workers: int, chunksize: int = 16,
+        sink: str = "files", shard_size: int = 1 << 30,
+        trace: Optional[str] = None, metrics_file: Optional[str] = None,
+        part: Optional[Part] = None, verify_sample: int = 64,
+        qa_path: Optional[str] = None, backend: Optional[str] = None,
+        image_sizes: Tuple[int, ...] = ()) -> Tuple[int, int]:
+    os.makedirs(output_dir, exist_ok=True)
+    # Import only the requested generators, once, so forked workers inherit them
+    for chart_type in chart_types:
+        registry.load(chart_type)
+    all_jobs = list(iter_jobs(chart_types, part_seeds(seeds, part), sizes))
+    key_of = functools.partial(job_key, backend=backend, image_sizes=image_sizes, with_qa=qa_path is not None)
+    progress_path = os.path.join(output_dir, _part_file(PROGRESS_FILE, part))
+    done = read_records(progress_path)
+    # Spot-check work from earlier runs before trusting it; anything that fails is redone
+    bad = verify(output_dir, list(done.values()), verify_sample) if verify_sample else []
+    qa_written = set()
+    if bad:
+        print(f"[batch] {len(bad)} of {min(verify_sample, len(done))} checked outputs are missing or "
+              f"corrupt, regenerating them: {', '.join(bad[:10])}", file=sys.stderr)
+        bad = set(bad)
+        # a redone tar sample goes into a new shard, so its old copy is taken out of the shard and its index
+        for shard in {done[key]["shard"] for key in bad if "shard" in done[key]}:
+            in_shard = [key for key, record in done.items() if record.get("shard") == shard]
+            kept = drop_samples(os.path.join(output_dir, shard),
+                                (_sample(done[key]) for key in in_shard if key in bad))
+            # samples lost with a damaged shard are redone as well
+            bad.update(key for key in in_shard if _sample(done[key]) not in kept)
+        # questions about redone charts were stored along with them the first time
+        qa_written = set(bad)
+        for key in bad:
+            del done[key]
+    jobs = [job for job in all_jobs if key_of(job) not in done]
+
+    completed = failed = 0
+    if jobs:
+        qa_store = qa.QAStore(_part_file(qa_path, part)) if qa_path else None
+        completed, failed = _run_jobs(jobs, chart_types, output_dir, workers, chunksize, sink,
+                                      shard_size, trace, metrics_file, progress_path, part, qa_store, backend,
+                                      image_sizes, qa_written)
+
+    if part is not None:
+        records = read_records(progress_path)
+        if all(key_of(job) in records for job in all_jobs):
+            write_manifest(os.path.join(output_dir, _part_file(MANIFEST_FILE, part)),
+                           (records[key_of(job)] for job in all_jobs))
+        else:
+            print(f"[batch] part {part[0]}/{part[1]} incomplete, no manifest written", file=sys.stderr)
+    return completed, failed
+
+
+def _run_jobs(jobs: List[Job], chart_types: List[str], output_dir: str, workers: int, chunksize: int,
+              sink: str, shard_size: int, trace: Optional[str], metrics_file: Optional[str],
+              progress_path: str, part: Optional[Part],
+              qa_store: Optional[qa.QAStore] = None, backend: Optional[str] = None,
+              image_sizes: Tuple[int, ...] = (), qa_written: Set[str] = frozenset()) -> Tuple[int, int]:
+    completed = failed = 0
+    progress = open(progress_path, "a")
+
+    def record(results: List[dict]):
+        if qa_store is not None:
+            for result in results:
+                rows = result.pop("qa")
+                if result["key"] not in qa_written:
+                    qa_store.write(rows)
+            # questions reach disk before their charts count as done, so a restart never loses them
+            qa_store.flush()
+        for result in results:
+            progress.write(json.dumps(result) + "\n")
+        progress.flush()
+
+    # Tar samples only count as done once their shard has been completed
+    pending: Dict[str, dict] = {}
+
+    def shard_closed(path: str, names: List[str]):
+        shard = os.path.relpath(path, output_dir)
+        record([dict(pending.pop(name), shard=shard) for name in names])
+
+    # With questions, loose files are recorded in batches too, so each flush writes many rows
+    batch: List[dict] = []
+    batch_size = qa_store.batch_size if qa_store is not None else 1
+
+    shards = None
+    if sink == "tar":
+        shards = TarShardSink(os.path.join(output_dir, "shards"), prefix=f"shard{part_suffix(part)}",
+                              max_shard_bytes=shard_size, on_close=shard_closed)
+
+    try:
+        initargs = (output_dir, chart_types, sink, trace, metrics_file, qa_store is not None, backend, image_sizes)
+        with Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+            # tar shards are filled in job order, so a rerun packs the same samples into the same shards
+            results = (pool.imap if shards is not None else pool.imap_unordered)(_run_job, jobs, chunksize=chunksize)
+            for result in results:
+                if "error" in result:
+                    failed += 1
+                    print(f"[batch] {result['key']} failed: {result['error']}", file=sys.stderr)
+                    continue
+                files = result.pop("files", None)
+                if shards is None:
+                    batch.append(result)
+                    if len(batch) >= batch_size:
+                        record(batch)
+                        batch = []
+                else:
+                    pending[os.path.splitext(result["metadata"])[0]] = result
+                    for name, ext, data in files:
+                        shards.write(name, ext, data)
+                completed += 1
+            # let workers exit normally so their metrics are written out
+            pool.close()
+            pool.join()
+    finally:
+        record(batch)
+        if shards is not None:
+            shards.close()
+        progress.close()
+    return completed, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate chart images and metadata in bulk.")
+    parser.add_argument("--types", default="all",
+                        help=f"comma separated chart types or 'all' ({', '.join(registry.names())})")
+    parser.add_argument("--seeds", default="0:100", help="seed range 'start:stop' or list 'a,b,c'")
+    parser.add_argument("--num-items", default=None,
+                        help="item counts 'start:stop' or 'a,b,c' (default: each generator's default)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--output-dir", default="./dataset")
+    parser.add_argument("--sink", choices=["files", "tar"], default="files",
+                        help="loose <name>.png/.json files, or WebDataset tar shards with a Parquet index")
+    parser.add_argument("--shard-size", type=int, default=1024, help="tar shard size in MiB")
+    parser.add_argument("--trace", default=os.environ.get("CHART_TRACE"),
+                        help="append a JSONL timing event per stage and chart to this file")
+    parser.add_argument("--metrics", default=os.environ.get("CHART_METRICS"),
+                        help="Prometheus textfile of stage timings, one per worker if it contains {pid}")
+    parser.add_argument("--shard", default=None,
+                        help="run only part i/N of the seeds (every N-th seed from the i-th) and write its manifest")
+    parser.add_argument("--verify", type=int, default=64,
+                        help="on restart, re-hash this many finished outputs at random and redo any that changed")
+    parser.add_argument("--qa", default=None, metavar="PATH",
+                        help="save multiple-choice questions with each chart as <name>.qa.json, "
+                             "and append them to this .jsonl or .parquet store")
+    parser.add_argument("--backend", choices=["raster"], default=None,
+                        help="draw bar, pie, line and area charts directly with PIL instead of Vega")
+    parser.add_argument("--sizes", default=None,
+                        help="also save every chart as a square image of each of these sizes, e.g. 224,336,448, "
+                             "rasterized from a single render")
+    parser.add_argument("--merge", nargs="+", default=None, metavar="DIR",
+                        help="merge the per-part manifests in these directories into <output-dir>/manifest.jsonl")
+    args = parser.parse_args(argv)
+
+    if args.merge:
+        try:
+            total = merge(args.merge, args.output_dir)
+        except ValueError as e:
+            parser.exit(1, f"[batch] {e}\n")
+        print(f"[batch] {total} charts in {os.path.join(args.output_dir, MANIFEST_FILE)}")
+        return 0
+
+    if args.types == "all":
+        chart_types = registry.names()
+    else:
+        chart_types = [t.strip() for t in args.types.split(",") if t.strip()]
+        unknown = [t for t in chart_types if t not in registry.GENERATORS]
+        if unknown:
+            parser.error(f"unknown chart types: {', '.join(unknown)}")
+    sizes = parse_range(args.num_items) if args.num_items else [None]
+    try:
+        part = parse_part(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    completed, failed = run(chart_types, parse_range(args.seeds), sizes,
+                            args.output_dir, args.workers, args.chunksize,
+                            args.sink, args.shard_size * 1024 * 1024,
+                            args.trace, args.metrics, part, args.verify, args.qa, args.backend,
+                            tuple(parse_range(args.sizes)) if args.sizes else ())
+    print(f"[batch] {completed} charts written, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,59 +6,113 @@ import altair as alt
 from typing import Optional, Dict, Any
 from PIL import Image
 from generators.generator import ChartGenerator
+from generators.downsample import grid_frame
+from generators.synthesis import data_rng, randint
 
 class BubbleGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300):
-        super().__init__(output_dir, img_format, width, height)
+    name = "bubble"
+    size_param = "num_points"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    qa_columns = ("label", "size")
+    qa_noun = ("bubble", "bubbles")
+    qa_measure = "size"
+    # labels are only in the legend, which dense charts leave out
+    qa_thinned_kinds = ()
+
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, num_points: int = 10, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
+
+        # letters run out (and chr() eventually fails) for large charts, which get numbered labels
+        default = [chr(65+i) for i in range(num_points)] if num_points <= 26 else [f"P{i+1}" for i in range(num_points)]
+        categories = kwargs.get("categories") or default
+        if (len(categories) != num_points):
+            categories = default
+        
+        # Bubbles are large, so dense charts keep only the biggest bubble per 15x15 pixel
+        # cell, the largest one overall among them
+        columns, rows = max(self.width // 15, 1), max(self.height // 15, 1)
+        dense = num_points > columns * rows
+        points = pd.DataFrame({
+            'x': np_rng.uniform(0, 100, num_points),
+            'y': np_rng.uniform(0, 100, num_points),
+            # among thousands of integer sizes the largest is shared, so dense charts draw
+            # continuous sizes and the largest bubble, named on the chart, is unique
+            'size': np_rng.uniform(20, 200, num_points) if dense else randint(np_rng, 20, 200, num_points),
+            'label': categories
+        })
+
+        largest = points.loc[points['size'].idxmax(), 'label']
+        shown = grid_frame(points, 'x', 'y', 'size', columns, rows)
+        color_scheme = rng.choice(['category10', 'tableau10'])
+        return {
+            "data": points,
+            "shown": shown,
+            "bgcolor": bgcolor,
+            "max_label": largest,
+            "variation": {
+                "color_scheme": color_scheme,
+                "num_points": num_points
+            },
+            "answer": largest
+        }
 
     def generate(self, seed: int = 0, num_points: int = 10, 
                  question_template: Optional[str] = "Which point has the largest size?",
                  **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+        synth = self.synthesize(seed=seed, num_points=num_points, **kwargs)
+        points = synth["data"]
 
         x_label = kwargs.get("x_label") or "x"
         y_label = kwargs.get("y_label") or "y"
         size_label = kwargs.get("size_label") or "size"
         title = kwargs.get("title") or f"Bubble Chart between {x_label} and {y_label} over {size_label}"
-        categories = kwargs.get("categories") or [chr(65+i) for i in range(num_points)]
-        if (len(categories) != num_points):
-            categories = [chr(65+i) for i in range(num_points)]
-        
-        points = pd.DataFrame({
-            'x': [random.uniform(0, 100) for _ in range(num_points)],
-            'y': [random.uniform(0, 100) for _ in range(num_points)],
-            'size': [random.randint(20, 200) for _ in range(num_points)],
-            'label': categories
-        })
 
-        largest = points.loc[points['size'].idxmax(), 'label']
-        color_scheme = random.choice(['category10', 'tableau10'])
+        shown = synth["shown"]
+        dense = len(shown) < len(points)
 
-        chart = alt.Chart(points).mark_circle(opacity=0.7).encode(
-            x=alt.X('x:Q', title=x_label),
-            y=alt.Y('y:Q', title=y_label),
-            size=alt.Size('size:Q', title=size_label),
-            color=alt.Color('label', scale=alt.Scale(scheme=color_scheme)),
-            tooltip=['label', 'x', 'y', 'size']
-        ).properties(width=self.width, height=self.height, title=title)
+        def build(data):
+            # a legend entry per bubble only fits while there are few of them
+            chart = alt.Chart(data).mark_circle(opacity=0.7).encode(
+                x=alt.X('x:Q', title=x_label),
+                y=alt.Y('y:Q', title=y_label),
+                size=alt.Size('size:Q', title=size_label),
+                color=alt.Color('label', scale=alt.Scale(scheme=synth["variation"]["color_scheme"]),
+                                legend=None if dense else alt.Undefined),
+                tooltip=['label', 'x', 'y', 'size']
+            ).properties(width=self.width, height=self.height, title=title)
+            if dense:
+                # without the legend, the largest bubble is labelled on the chart so the answer stays visible
+                name = alt.Chart(data).transform_joinaggregate(
+                    max_size='max(size)'
+                ).transform_filter(
+                    'datum.size == datum.max_size'
+                ).mark_text(fontWeight='bold', dy=-14).encode(
+                    x='x:Q', y='y:Q', text='label'
+                )
+                chart = alt.layer(chart, name)
+            return chart
 
-        filename = f"BubbleChart"
-        self._save_chart(chart, filename)
-        self._make_square_padding(os.path.join(self.output_dir, 
-                                               f"{filename}.{self.img_format}"), 
-                                               size=self.width,
-                                               overlay_rgba=bgcolor)
+        chart = self._chart_spec(shown, build, variation=synth["variation"], dense=dense,
+                                 x_label=x_label, y_label=y_label, size_label=size_label, title=title)
+
+        filename = self._output_name("BubbleChart", seed,
+                                     num_points=num_points,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_chart(chart), filename, overlay_rgba=synth["bgcolor"])
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "bubble",
-            "max_label": largest,
-            "variation": {
-                "color_scheme": color_scheme,
-                "num_points": num_points
-            },
+            "max_label": synth["max_label"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": largest
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+Entry = Tuple[str, str]
+
+
+class RenderCache:
+    """LRU cache of rendered charts on disk, keyed on the full request.
+
+    Renders are handed over as bytes and the cache owns the only copy of each,
+    under `cache_dir` sharded as <xx>/<key>.<ext>; the least recently used
+    entries are evicted once they take more than `max_bytes`. Only the LRU
+    order and sizes are kept in memory: Gradio serves images and metadata by
+    path, so holding their bytes as well would save nothing. Concurrent misses
+    on the same key wait for a single render instead of starting their own.
+    """
+
+    def __init__(self, cache_dir: str = "./charts/cache", max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Lock] = {}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(**kwargs) -> str:
+        payload = json.dumps(kwargs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _paths(self, key: str) -> Entry:
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return f"{base}.png", f"{base}.json"
+
+    def _load(self):
+        # Rebuild the disk tier's LRU order from file mtimes (touched whenever an entry is read back from disk)
+        entries = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                key, ext = os.path.splitext(name)
+                if ext != ".json":
+                    continue
+                img_path, json_path = self._paths(key)
+                if not os.path.exists(img_path):
+                    continue
+                stat = os.stat(json_path)
+                entries.append((stat.st_mtime, key, stat.st_size + os.path.getsize(img_path)))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            if key not in self._disk:
+                return None
+            entry = self._paths(key)
+            if not all(os.path.exists(p) for p in entry):
+                self._drop(key)
+                return None
+            os.utime(entry[1])
+            self._disk.move_to_end(key)
+            return entry
+
+    def put(self, key: str, image: bytes, metadata: bytes) -> Entry:
+        """Store a freshly rendered image/metadata pair, e.g. collected by a MemorySink."""
+        entry = self._paths(key)
+        os.makedirs(os.path.dirname(entry[0]), exist_ok=True)
+        for path, data in zip(entry, (image, metadata)):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        size = len(image) + len(metadata)
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = size
+            self._disk_bytes += size
+            self._evict()
+        return entry
+
+    def get_or_render(self, key: str, render: Callable[[], Tuple[bytes, bytes]]) -> Entry:
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            inflight = self._inflight.setdefault(key, threading.Lock())
+        with inflight:
+            entry = self.get(key)
+            if entry is None:
+                entry = self.put(key, *render())
+        with self._lock:
+            self._inflight.pop(key, None)
+        return entry
+
+    def _drop(self, key: str):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        for path in self._paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _evict(self):
+        # Never evict the entry that was just added
+        while self._disk_bytes > self.max_bytes and len(self._disk) > 1:
+            self._drop(next(iter(self._disk)))
@@ -1,92 +1,123 @@
 import os
 import random
 import json
+import functools
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from typing import Dict, Any
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, value_table
+
+STATE_ABBR = [
+    'AL','AK','AZ','AR','CA','CO','CT','DE','FL','GA',
+    'HI','ID','IL','IN','IA','KS','KY','LA','ME','MD',
+    'MA','MI','MN','MS','MO','MT','NE','NV','NH','NJ',
+    'NM','NY','NC','ND','OH','OK','OR','PA','RI','SC',
+    'SD','TN','TX','UT','VT','VA','WA','WV','WI','WY'
+]
+
+
+@functools.lru_cache(maxsize=64)
+def _base_figure(width: int, height: int, value_label: str, title: str) -> Dict[str, Any]:
+    # Everything but the state values is the same for every seed, so the figure is
+    # built once per layout and generate() only swaps in new z values. The map
+    # geometry itself stays cached inside the long-lived Kaleido process.
+    df = pd.DataFrame({'state': STATE_ABBR, 'value': 0})
+
+    fig = px.choropleth(
+        df,
+        locations='state',
+        locationmode="USA-states",
+        color='value',
+        scope="usa",
+        color_continuous_scale="Blues",
+        labels={'value': value_label},
+    )
+
+    fig.add_trace(go.Scattergeo(
+        locationmode='USA-states',
+        locations=df['state'],
+        text=df['state'],
+        mode='text',
+        textfont=dict(color='black', size=7, family="Arial Black"),
+        showlegend=False
+    ))
+
+    fig.update_layout(
+        width=width,
+        height=height,
+        title=dict(
+            text=title,
+            font=dict(size=16, family="Arial Black"),
+            x=0.5,
+            xanchor='center'
+        ),
+        margin={"r": 0, "t": 40, "l": 0, "b": 0},
+        geo=dict(
+            scope="usa",
+            projection=dict(type="albers usa"),
+            showlakes=True,
+            lakecolor="LightBlue",
+        ),
+        coloraxis_colorbar=dict(title=value_label),
+    )
+    return fig.to_dict()
+
 
 class ChoroplethGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 700, height: int = 500):
-        super().__init__(output_dir, img_format, width, height)
+    name = "choropleth"
+    size_param = None
+    defaults = {"width": 700, "height": 500}
+    backend = "kaleido"
+    qa_columns = ("state", "value")
+    qa_noun = ("state", "states")
+
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 700, height: int = 500,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
+
+        df = value_table(np_rng, STATE_ABBR, 10, 100, label_col='state', value_col='value')
+
+        max_state = df.loc[df["value"].idxmax(), "state"]
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
+            "max_state": max_state,
+            "variation": {
+                "color_scheme": "Blues",
+                "num_states": len(STATE_ABBR)
+            },
+            "answer": max_state
+        }
 
     def generate(self, seed: int = 0, question_template: str = "Which state has the highest value?", **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+        synth = self.synthesize(seed=seed, **kwargs)
+        df = synth["data"]
 
         value_label = kwargs.get("y_label") or "Value"
         title = kwargs.get("title") or "Choropleth Map over value"
-        
-        state_abbr = [
-            'AL','AK','AZ','AR','CA','CO','CT','DE','FL','GA',
-            'HI','ID','IL','IN','IA','KS','KY','LA','ME','MD',
-            'MA','MI','MN','MS','MO','MT','NE','NV','NH','NJ',
-            'NM','NY','NC','ND','OH','OK','OR','PA','RI','SC',
-            'SD','TN','TX','UT','VT','VA','WA','WV','WI','WY'
-        ]
-
-        df = pd.DataFrame({
-            'state': state_abbr,
-            'value': [random.randint(10, 100) for _ in state_abbr]
-        })
 
-        max_state = df.loc[df["value"].idxmax(), "state"]
+        base = _base_figure(self.width, self.height, value_label, title)
+        # shallow copies: the cached base figure is shared and never modified
+        choropleth = dict(base["data"][0], z=df["value"].to_numpy())
+        fig = dict(base, data=[choropleth] + base["data"][1:])
 
-        fig = px.choropleth(
-            df,
-            locations='state',
-            locationmode="USA-states",
-            color='value',
-            scope="usa",
-            color_continuous_scale="Blues",
-            labels={'value': value_label},
-        )
-
-        fig.add_trace(go.Scattergeo(
-            locationmode='USA-states',
-            locations=df['state'],
-            text=df['state'],
-            mode='text',
-            textfont=dict(color='black', size=7, family="Arial Black"),
-            showlegend=False
-        ))
-
-        fig.update_layout(
-            width=self.width,
-            height=self.height,
-            title=dict(
-                text=title,
-                font=dict(size=16, family="Arial Black"),
-                x=0.5,
-                xanchor='center'
-            ),
-            margin={"r": 0, "t": 40, "l": 0, "b": 0},
-            geo=dict(
-                scope="usa",
-                projection=dict(type="albers usa"),
-                showlakes=True,
-                lakecolor="LightBlue",
-            ),
-            coloraxis_colorbar=dict(title=value_label),
-        )
-
-        filename = f"Choropleth"
-        save_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        fig.write_image(save_path, width=self.width, height=self.height)
-        self._make_square_padding(os.path.join(self.output_dir, 
-                                               f"{filename}.{self.img_format}"), 
-                                               size=self.width,
-                                               overlay_rgba=bgcolor)
+        filename = self._output_name("Choropleth", seed,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_figure(fig), filename, overlay_rgba=synth["bgcolor"])
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "choropleth",
-            "max_state": max_state,
-            "variation": {
-                "color_scheme": "Blues",
-                "num_states": len(state_abbr)
-            },
+            "max_state": synth["max_state"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": max_state
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
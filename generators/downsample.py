@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# Point reduction for series and scatters with far more points than pixels.
+#
+# Generators hand Vega-Lite at most about one point per pixel column (lines)
+# or per grid cell (scatters), so render time follows the chart size rather
+# than the number of points. Both reductions keep real data points and always
+# keep the ones a chart's answer is about.
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of threshold points picked by Largest-Triangle-Three-Buckets, in order.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the mean of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    out = np.empty(threshold, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = out[i + 1] = lo + int(area.argmax())
+    return out
+
+
+def with_extrema(indices: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """indices plus the positions of the maximum and minimum of y, sorted."""
+    return np.union1d(indices, [int(np.argmax(y)), int(np.argmin(y))])
+
+
+def lttb_frame(df: pd.DataFrame, x: str, y: str, threshold: int) -> pd.DataFrame:
+    if len(df) <= threshold:
+        return df
+    return df.iloc[with_extrema(lttb(df[x].to_numpy(), df[y].to_numpy(), threshold), df[y].to_numpy())]
+
+
+def grid_frame(df: pd.DataFrame, x: str, y: str, score: str, columns: int, rows: int) -> pd.DataFrame:
+    """The highest-score point of every occupied cell of a columns x rows grid.
+
+    A frame with no more points than cells is returned as is.
+    """
+    if len(df) <= columns * rows:
+        return df
+    xs, ys = df[x].to_numpy(), df[y].to_numpy()
+    col = np.minimum(((xs - xs.min()) / ((xs.max() - xs.min()) or 1) * columns).astype(np.int64), columns - 1)
+    row = np.minimum(((ys - ys.min()) / ((ys.max() - ys.min()) or 1) * rows).astype(np.int64), rows - 1)
+    best = pd.Series(df[score].to_numpy()).groupby(row * columns + col).idxmax().to_numpy()
+    return df.iloc[np.sort(best)]
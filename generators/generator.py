@@ -1,33 +1,211 @@
-import os
+import io
 import random
 import json
-import numpy as np
-import pandas as pd
-import altair as alt
-from typing import Optional, Dict, Any
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Dict, Any, Sequence, Tuple, Union
 from PIL import Image
+from generators.compositor import pad_square
+from generators.metrics import timed
+from generators.renderers import VegaRenderer, KaleidoRenderer, rasterize
+from generators.sinks import FileSink
 
 class ChartGenerator:
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200):
+    # Declared by every subclass and used by generators.registry:
+    # chart type name, the generate() keyword that sets the number of items (None
+    # if fixed), constructor defaults, and the renderer backend ("vega" or "kaleido").
+    # Generators that can also render another way list those backends for instances to pick.
+    name: str = ""
+    size_param: Optional[str] = None
+    defaults: Dict[str, Any] = {}
+    backend: str = ""
+    backends: Tuple[str, ...] = ()
+
+    # For generators.qa: the (label, value) columns of synthesize()["data"], None if the
+    # chart has no value per label, what a label and its value are called, and the
+    # question kinds that make sense for the chart (None for all)
+    qa_columns: Optional[Tuple[str, str]] = None
+    qa_noun: Tuple[str, str] = ("category", "categories")
+    qa_measure: str = "value"
+    qa_kinds: Optional[Tuple[str, ...]] = None
+    # and those still answerable from a chart thinned by generators.downsample, which
+    # keeps the extremes but not every label, count or total
+    qa_thinned_kinds: Tuple[str, ...] = ("argmax", "argmin")
+
+    # One warm renderer per backend and process, shared by every generator instance
+    _vega_renderer: Optional[VegaRenderer] = None
+    _kaleido_renderer: Optional[KaleidoRenderer] = None
+    _renderer_lock = threading.Lock()
+
+    # Vega-Lite specs without their data, see _chart_spec()
+    _spec_templates: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    _spec_templates_lock = threading.Lock()
+    max_spec_templates = 512
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Subclasses define their own generate()/synthesize(); time those too (see generators.metrics)
+        for method in ("generate", "synthesize"):
+            func = cls.__dict__.get(method)
+            if func is not None and not hasattr(func, "__timed__"):
+                setattr(cls, method, timed(method)(func))
+
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200,
+                 sink=None, backend: Optional[str] = None, sizes: Sequence[int] = ()):
+        if backend is not None and backend != self.backend:
+            if backend not in self.backends:
+                raise ValueError(f"{type(self).__name__} has no {backend!r} backend, "
+                                 f"expected one of {', '.join((type(self).backend,) + self.backends)}")
+            self.backend = backend
         self.output_dir = output_dir
         self.img_format = img_format
         self.width = width
         self.height = height
-        os.makedirs(self.output_dir, exist_ok=True)
+        # Where images and metadata go: loose files by default, or e.g. a TarShardSink
+        # FileSink creates directories as it writes, so nothing is touched until a chart is saved
+        self.sink = sink or FileSink(output_dir)
+        # Extra square sizes saved next to every chart, see _save_images()
+        self.sizes = tuple(sizes)
+
+    def size_kwargs(self, num_items: Optional[int]) -> Dict[str, int]:
+        if self.size_param is None or num_items is None:
+            return {}
+        return {self.size_param: num_items}
+
+    def _output_name(self, prefix: str, seed: int, **params) -> str:
+        # Content-addressed name: the same (generator, seed, params) always maps to the
+        # same file, and different ones never collide. Sharded as <prefix>/<xx>/<digest>.
+        key = json.dumps({
+            "generator": type(self).__name__,
+            "seed": seed,
+            "width": self.width,
+            "height": self.height,
+            "img_format": self.img_format,
+            "params": params,
+            # only named when not the default, so existing names stay the same
+            **({"backend": self.backend} if self.backend != type(self).backend else {}),
+            # extra sizes are listed in the metadata, so they make different files too
+            **({"sizes": list(self.sizes)} if self.sizes else {})
+        }, sort_keys=True, default=str)
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+        return f"{prefix}/{digest[:2]}/{digest}"
+
+    @property
+    def vega_renderer(self) -> VegaRenderer:
+        if ChartGenerator._vega_renderer is None:
+            with ChartGenerator._renderer_lock:
+                if ChartGenerator._vega_renderer is None:
+                    ChartGenerator._vega_renderer = VegaRenderer()
+        return ChartGenerator._vega_renderer
+
+    @property
+    def kaleido_renderer(self) -> KaleidoRenderer:
+        if ChartGenerator._kaleido_renderer is None:
+            with ChartGenerator._renderer_lock:
+                if ChartGenerator._kaleido_renderer is None:
+                    ChartGenerator._kaleido_renderer = KaleidoRenderer()
+        return ChartGenerator._kaleido_renderer
+
+    def _chart_spec(self, data, build: Callable[[Any], Any], **key) -> Dict[str, Any]:
+        """Vega-Lite spec of build(data), from a template cached per generator, size and key.
+
+        build(data) must depend on nothing but the data and what `key` captures
+        (variation, labels, title, ...): the first chart built for a key is kept
+        with its data stripped, and later calls only inject the new values,
+        skipping altair's object construction and to_dict() entirely.
+        """
+        key = json.dumps({"generator": type(self).__name__, "width": self.width, "height": self.height,
+                          "key": key}, sort_keys=True, default=str)
+        with ChartGenerator._spec_templates_lock:
+            template = ChartGenerator._spec_templates.get(key)
+            if template is not None:
+                ChartGenerator._spec_templates.move_to_end(key)
+        if template is None:
+            spec = self.vega_renderer.to_spec(build(data))
+            if len(spec.get("datasets", {})) != 1 or list(spec.get("data", {})) != ["name"]:
+                # only charts over a single inline dataset are templated
+                return spec
+            template = {k: v for k, v in spec.items() if k not in ("data", "datasets")}
+            with ChartGenerator._spec_templates_lock:
+                ChartGenerator._spec_templates[key] = template
+                while len(ChartGenerator._spec_templates) > self.max_spec_templates:
+                    ChartGenerator._spec_templates.popitem(last=False)
+        return dict(template, data={"values": self.vega_renderer.to_values(data)})
+
+    # With extra sizes to produce, charts are also rendered to SVG and rasterized per size
 
-    def _save_chart(self, chart: alt.Chart, filename: str):
-        chart_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        chart.save(chart_path)
+    @timed("render")
+    def _render_chart(self, chart) -> Union[bytes, str]:
+        if self.sizes:
+            return self.vega_renderer.render_svg(chart)
+        return self.vega_renderer.render(chart)
 
+    @timed("render")
+    def _render_figure(self, fig) -> Union[bytes, Tuple[bytes, str]]:
+        png = self.kaleido_renderer.render(fig, width=self.width, height=self.height)
+        if self.sizes:
+            # resvg draws text a little differently from Chromium, so the main image stays
+            # Kaleido's PNG, the same bytes as without sizes, and only the extra sizes use the SVG
+            return png, self.kaleido_renderer.render(fig, width=self.width, height=self.height,
+                                                     format="svg").decode("utf-8")
+        return png
+
+    @timed("render")
+    def _render_raster(self, draw: Callable[..., Image.Image], *args, **kwargs) -> Image.Image:
+        # for backend="raster", see generators.raster
+        return draw(*args, **kwargs)
+
+    @timed("rasterize")
+    def _rasterize(self, svg: str, scale: float = 1.0) -> bytes:
+        return rasterize(svg, scale=scale)
+
+    def _save_images(self, rendered: Union[bytes, str, Image.Image, Tuple[bytes, str]], filename: str,
+                     overlay_rgba: Optional[str] = None, overlay_opacity: float = 0.15):
+        """Pad and save a rendered chart, then again at each of self.sizes as <filename>.<size>.<img_format>.
+
+        An SVG render, given alone or as (image, svg), is rasterized once per
+        size, scaled so the padded square comes out at exactly that size with
+        the layout of the main image. Charts drawn without a vector form are
+        resampled from the main image.
+        """
+        main, vector = rendered if isinstance(rendered, tuple) else (rendered, rendered)
+        if not isinstance(vector, str):
+            vector = None
+        image = self._make_square_padding(self._rasterize(main) if isinstance(main, str) else main,
+                                          size=self.width, overlay_rgba=overlay_rgba, overlay_opacity=overlay_opacity)
+        self._save_chart(image, filename)
+        for size in self.sizes:
+            if vector is not None:
+                resized = self._make_square_padding(self._rasterize(vector, size / image.width), size=size,
+                                                    overlay_rgba=overlay_rgba, overlay_opacity=overlay_opacity)
+            else:
+                resized = image.resize((size, size), Image.LANCZOS)
+            self._save_chart(resized, filename, size)
+
+    @timed("save_chart")
+    def _save_chart(self, image: Image.Image, filename: str, size: Optional[int] = None):
+        # The only encode of the final image: renders and padding stay in memory.
+        buf = io.BytesIO()
+        image.save(buf, format=Image.registered_extensions()[f".{self.img_format}"])
+        self.sink.write(filename, self._image_ext(size), buf.getvalue())
+
+    def _image_ext(self, size: Optional[int] = None) -> str:
+        return self.img_format if size is None else f"{size}.{self.img_format}"
+
+    @timed("save_metadata")
     def _save_metadata(self, metadata: Dict[str, Any], filename: str):
-        meta_path = os.path.join(self.output_dir, f"{filename}.json")
-        with open(meta_path, "w") as f:
-            json.dump(metadata, f, indent=2)
-
-    def _random_rgba(self, alpha: float = 1.0) -> str:
-        r = random.randint(220, 255)
-        g = random.randint(220, 255)
-        b = random.randint(220, 255)
+        if self.sizes:
+            metadata = dict(metadata, images={str(size): f"{filename}.{self._image_ext(size)}" for size in self.sizes})
+        self.sink.write(filename, "json", json.dumps(metadata, indent=2).encode("utf-8"))
+
+    def _random_rgba(self, rng: Optional[random.Random] = None, alpha: float = 1.0) -> str:
+        # Generators pass their own per-call RNG; the module-level one is shared
+        # between threads and only kept as a fallback.
+        rng = rng or random
+        r = rng.randint(220, 255)
+        g = rng.randint(220, 255)
+        b = rng.randint(220, 255)
         return f"rgba({r},{g},{b},{alpha})"
     
     def _rgba_str_to_tuple(self, rgba: str) -> tuple:
@@ -35,30 +213,23 @@ class ChartGenerator:
         r, g, b, a = map(float, rgba.split(","))
         return int(r), int(g), int(b), float(a)
     
-    def _make_square_padding(self, img_path: str, save_path: Optional[str] = None,
+    @timed("padding")
+    def _make_square_padding(self, img: Union[bytes, Image.Image],
                               size: int = 224, 
-                              overlay_rgba: Optional[str] = None, overlay_opacity: float = 0.15):
-        img = Image.open(img_path).convert("RGBA")
-        w, h = img.size
-        dim = max(size, w, h)
-
-        result = Image.new("RGBA", (dim, dim), (255, 255, 255, 255))
+                              overlay_rgba: Optional[str] = None, overlay_opacity: float = 0.15) -> Image.Image:
+        overlay = self._rgba_str_to_tuple(overlay_rgba) if overlay_rgba is not None else None
+        return pad_square(img, size=size, overlay_rgba=overlay, overlay_opacity=overlay_opacity)
 
-        paste_x = (dim - w) // 2
-        paste_y = (dim - h) // 2
-        result.paste(img, (paste_x, paste_y), img)
+    def synthesize(self, *args, **kwargs) -> Dict[str, Any]:
+        """Data, variation choices and answer of a chart, without rendering it.
 
-        # background
-        if overlay_rgba is not None:
-            r, g, b, a = self._rgba_str_to_tuple(overlay_rgba)
-            overlay = Image.new("RGBA", (dim, dim), (r, g, b, int(255 * overlay_opacity)))
-            result = Image.alpha_composite(result, overlay)
-
-        if save_path is None:
-            save_path = img_path
-
-        # Saves RGB
-        result.convert("RGB").save(save_path)
+        Makes exactly the random draws generate() makes for the same seed and
+        arguments, so the returned "data", "variation" and "answer" are those of
+        the chart generate() would render. Charts that draw only part of their
+        data also return the drawn rows as "shown". Cheap enough to scan many
+        seeds and only render the ones worth keeping.
+        """
+        raise NotImplementedError("Subclasses should implement this method.")
 
     def generate(*args, **kwargs):
         raise NotImplementedError("Subclasses should implement this method.")
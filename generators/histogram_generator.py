@@ -1,80 +1,90 @@
 import os
 import random
 import json
-import pandas as pd
 import altair as alt
-from typing import Optional
+from typing import Optional, Dict, Any
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, histogram_table, sample
 
 class HistogramGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300):
-        super().__init__(output_dir, img_format, width, height)
+    name = "histogram"
+    size_param = "num_bins"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    qa_columns = ("bin", "count")
+    qa_noun = ("bin", "bins")
+    qa_measure = "count"
+
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, num_bins: int = 10, num_values: int = 100,
+                   distribution: str = "gaussian", **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
+
+        # The chart is drawn from these bins, so the answer always matches the picture
+        # and the spec holds at most num_bins rows whatever num_values is
+        df = histogram_table(sample(np_rng, distribution, num_values), num_bins)
+
+        max_bin = df.loc[df['count'].idxmax(), 'bin']
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
+            "max_bin": max_bin,
+            "variation": {
+                # round bin edges may need fewer bins than requested
+                "num_bins": len(df),
+                "num_values": num_values,
+                "distribution": distribution
+            },
+            "answer": max_bin
+        }
 
     def generate(self, seed: int = 0, num_bins: int = 10, num_values: int = 100,
                  distribution: str = "gaussian",
                  question_template: Optional[str] = "Which bin has the most values?", **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+        synth = self.synthesize(seed=seed, num_bins=num_bins, num_values=num_values,
+                                distribution=distribution, **kwargs)
+        df = synth["data"]
         values_label = kwargs.get("y_label") or "Value"
         title = kwargs.get("title") or f"Histogram of {values_label}"
 
-        if distribution == "gaussian":
-            values = [random.gauss(50, 15) for _ in range(num_values)]
-        elif distribution == "uniform":
-            values = [random.uniform(0, 100) for _ in range(num_values)]
-        elif distribution == "exponential":
-            values = [random.expovariate(1 / 30) for _ in range(num_values)]
-        elif distribution == "bimodal":
-            values = [
-                random.gauss(30, 5) if i < num_values // 2 else random.gauss(70, 5)
-                for i in range(num_values)
-            ]
-        else:
-            raise ValueError(f"Unsupported distribution type: {distribution}")
-
-        df = pd.DataFrame({'value': values})
-
+        def build(data):
+            chart = alt.Chart(data).mark_bar().encode(
+                x=alt.X('bin_start:Q', bin='binned', title=values_label),
+                x2='bin_end:Q',
+                y=alt.Y('count:Q', title="Frequency"),
+                tooltip=['bin', 'count']
+            ).properties(width=self.width, height=self.height, title=title)
 
-        chart = alt.Chart(df).mark_bar().encode(
-            x=alt.X('value:Q', bin=alt.Bin(maxbins=num_bins), title=values_label),
-            y=alt.Y('count()', title="Frequency"),
-            tooltip=['count()']
-        ).properties(width=self.width, height=self.height, title=title)
+            chart = chart.configure_view(
+                stroke=None
+            ).configure_axis(
+                labelFontSize=11, titleFontSize=13,
+                labelColor="#444", titleColor="#222",
+                gridColor="rgba(0,0,0,0.08)"
+            )
+            return chart
 
-        chart = chart.configure_view(
-            stroke=None
-        ).configure_axis(
-            labelFontSize=11, titleFontSize=13,
-            labelColor="#444", titleColor="#222",
-            gridColor="rgba(0,0,0,0.08)"
-        )
+        chart = self._chart_spec(df, build, variation=synth["variation"],
+                                 values_label=values_label, title=title)
 
-        filename = f"Histogram"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(
-            img_path,
-            size=self.width,
-            overlay_rgba=bgcolor,
-            overlay_opacity=0.15
-        )
-
-        bins = pd.cut(df['value'], bins=num_bins)
-        bin_counts = bins.value_counts().sort_values(ascending=False)
-        max_bin = str(bin_counts.index[0])
+        filename = self._output_name("Histogram", seed,
+                                     num_bins=num_bins, num_values=num_values, distribution=distribution,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_chart(chart), filename, overlay_rgba=synth["bgcolor"], overlay_opacity=0.15)
 
         # Save metadata
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "histogram",
-            "max_bin": max_bin,
-            "variation": {
-                "num_bins": num_bins,
-                "num_values": num_values,
-                "distribution": distribution
-            },
+            "max_bin": synth["max_bin"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": max_bin
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
@@ -1,56 +1,97 @@
 import os
 import random
 import json
+import numpy as np
 import pandas as pd
 import altair as alt
 from typing import Optional, Dict, Any
 from PIL import Image
+from generators import raster
 from generators.generator import ChartGenerator
+from generators.downsample import lttb_frame
+from generators.synthesis import LONG_SERIES, data_rng, randint, walk
 
 class LineGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300):
-        super().__init__(output_dir, img_format, width, height)
+    name = "line"
+    size_param = "num_points"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    backends = ("raster",)
+    qa_columns = ("x", "y")
+    qa_noun = ("x value", "x values")
+    qa_measure = "y value"
+
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300,
+                 sink=None, backend: Optional[str] = None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, backend, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, num_points: int = 10, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
+
+        # long series follow a random walk, independent values would only draw noise
+        y = randint(np_rng, 10, 100, num_points) if num_points <= LONG_SERIES else walk(np_rng, num_points, 10, 100)
+        df = pd.DataFrame({'x': np.arange(1, num_points + 1), 'y': y})
+        max_x = int(df.loc[df['y'].idxmax(), 'x'])
+        # at most one point per pixel column reaches the renderer, the maximum among them
+        shown = lttb_frame(df, 'x', 'y', self.width)
+
+        color = rng.choice(['#1f77b4', '#ff7f0e', '#2ca02c'])
+        return {
+            "data": df,
+            "shown": shown,
+            "bgcolor": bgcolor,
+            "max_x": max_x,
+            "variation": {
+                "color": color,
+                "num_points": num_points
+            },
+            "answer": max_x
+        }
 
     def generate(self, seed: int = 0, num_points: int = 10, 
                  question_template: Optional[str] = "At which x-position is the value highest?",
                  **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
-        
-        x_vals = list(range(1, num_points + 1))
-        y_vals = [random.randint(10, 100) for _ in x_vals]
-        df = pd.DataFrame({'x': x_vals, 'y': y_vals})
-        max_x = df.loc[df['y'].idxmax(), 'x']
-
-        color = random.choice(['#1f77b4', '#ff7f0e', '#2ca02c'])
-        
+        synth = self.synthesize(seed=seed, num_points=num_points, **kwargs)
+        df = synth["data"]
+
         x_label = kwargs.get("x_label") or "x"
         y_label = kwargs.get("y_label") or "y"
         title = kwargs.get("title") or f"Line Chart between {x_label} and {y_label}"
 
-        chart = alt.Chart(df).mark_line(color=color, point=True, interpolate="monotone").encode(
-            x=alt.X('x:Q', title=x_label),
-            y=alt.Y('y:Q', title=y_label),
-            tooltip=["x", "y"]
-        ).properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
+        shown = synth["shown"]
+        dense = len(shown) < len(df)
+
+        def build(data):
+            # point markers only while they can be told apart
+            chart = alt.Chart(data).mark_line(color=synth["variation"]["color"], point=not dense,
+                                              interpolate="monotone").encode(
+                x=alt.X('x:Q', title=x_label),
+                y=alt.Y('y:Q', title=y_label),
+                tooltip=["x", "y"]
+            ).properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
+            return chart
+
+        if self.backend == "raster":
+            rendered = self._render_raster(raster.line, shown, self.width, self.height, title, x_label, y_label,
+                                           synth["variation"]["color"], markers=not dense)
+        else:
+            rendered = self._render_chart(self._chart_spec(shown, build, variation=synth["variation"], dense=dense,
+                                                           x_label=x_label, y_label=y_label, title=title))
 
-        filename = f"LineChart"
-        self._save_chart(chart, filename)
-        self._make_square_padding(os.path.join(self.output_dir, 
-                                               f"{filename}.{self.img_format}"), 
-                                               size=self.width,
-                                               overlay_rgba=bgcolor)
+        filename = self._output_name("LineChart", seed,
+                                     num_points=num_points,
+                                     question_template=question_template, **kwargs)
+        self._save_images(rendered, filename, overlay_rgba=synth["bgcolor"])
 
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "line",
-            "max_x": int(max_x),
-            "variation": {
-                "color": color,
-                "num_points": num_points
-            },
+            "max_x": synth["max_x"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": int(max_x)
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
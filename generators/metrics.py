@@ -0,0 +1,157 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from multiprocessing import util
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Timing hooks for the generation hot path.
+#
+# ChartGenerator times generate(), synthesize(), rendering, padding and both
+# saves with @timed. Every registered hook is called as
+# hook(chart_type, stage, seconds, error) after each timed call; with no hooks
+# registered the only cost is one list check per call. A run can be traced
+# without touching code by setting CHART_TRACE=<file.jsonl> and/or
+# CHART_METRICS=<file.prom> (may contain {pid}) in the environment.
+
+Hook = Callable[[str, str, float, Optional[str]], None]
+
+_hooks: List[Hook] = []
+
+
+def add_hook(hook: Hook):
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook):
+    _hooks.remove(hook)
+
+
+def timed(stage: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not _hooks:
+                return func(self, *args, **kwargs)
+            error = None
+            start = time.perf_counter()
+            try:
+                return func(self, *args, **kwargs)
+            except BaseException as e:
+                error = type(e).__name__
+                raise
+            finally:
+                seconds = time.perf_counter() - start
+                chart_type = self.name or type(self).__name__
+                for hook in _hooks:
+                    hook(chart_type, stage, seconds, error)
+        wrapper.__timed__ = stage
+        return wrapper
+    return decorator
+
+
+class JsonlTrace:
+    """Appends one JSON line per timed call; safe to share between threads and processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def __call__(self, chart_type: str, stage: str, seconds: float, error: Optional[str]):
+        event = {"time": time.time(), "pid": os.getpid(), "thread": threading.get_ident(),
+                 "chart_type": chart_type, "stage": stage, "seconds": seconds}
+        if error is not None:
+            event["error"] = error
+        with self._lock:
+            # one write per line, so concurrent appends never interleave mid-line
+            self._file.write(json.dumps(event) + "\n")
+
+    def close(self):
+        self._file.close()
+
+
+class Counters:
+    """Prometheus-style histogram of stage timings plus an error counter.
+
+    render() returns the text exposition format. With `textfile` set (e.g. for
+    node_exporter's textfile collector), it is rewritten at most every
+    `interval` seconds and when the process exits; "{pid}" in the path gives
+    every worker process its own file.
+    """
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, textfile: Optional[str] = None, interval: float = 10.0,
+                 buckets: Sequence[float] = BUCKETS):
+        self.textfile = textfile
+        self.interval = interval
+        self.buckets = tuple(buckets)
+        self._counts: Dict[Tuple[str, str], List[int]] = {}
+        self._sums: Dict[Tuple[str, str], float] = {}
+        self._errors: Dict[Tuple[str, str, str], int] = {}
+        self._lock = threading.Lock()
+        self._written = time.monotonic()
+        if textfile is not None:
+            atexit.register(self.write)
+            # pool workers leave through multiprocessing's exit handlers instead of atexit
+            util.Finalize(None, self.write, exitpriority=10)
+
+    def __call__(self, chart_type: str, stage: str, seconds: float, error: Optional[str]):
+        key = (chart_type, stage)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._sums[key] += seconds
+            if error is not None:
+                error_key = (chart_type, stage, error)
+                self._errors[error_key] = self._errors.get(error_key, 0) + 1
+        if self.textfile is not None and time.monotonic() - self._written >= self.interval:
+            self.write()
+
+    def render(self) -> str:
+        lines = ["# HELP chart_generator_stage_seconds Time spent per chart generation stage.",
+                 "# TYPE chart_generator_stage_seconds histogram"]
+        with self._lock:
+            for (chart_type, stage), counts in sorted(self._counts.items()):
+                labels = f'chart_type="{chart_type}",stage="{stage}"'
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'chart_generator_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'chart_generator_stage_seconds_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+                lines.append(f"chart_generator_stage_seconds_sum{{{labels}}} {self._sums[(chart_type, stage)]}")
+                lines.append(f"chart_generator_stage_seconds_count{{{labels}}} {counts[-1]}")
+            lines += ["# HELP chart_generator_stage_errors_total Failed calls per chart generation stage.",
+                      "# TYPE chart_generator_stage_errors_total counter"]
+            for (chart_type, stage, error), count in sorted(self._errors.items()):
+                lines.append(f'chart_generator_stage_errors_total{{chart_type="{chart_type}",stage="{stage}",'
+                             f'error="{error}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Optional[str] = None):
+        path = (path or self.textfile).format(pid=os.getpid())
+        self._written = time.monotonic()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+def configure(trace: Optional[str] = None, metrics: Optional[str] = None, interval: float = 10.0):
+    """Replace the registered hooks with a JSONL trace and/or a Prometheus textfile."""
+    _hooks.clear()
+    if trace:
+        add_hook(JsonlTrace(trace))
+    if metrics:
+        add_hook(Counters(textfile=metrics, interval=interval))
+
+
+if os.environ.get("CHART_TRACE") or os.environ.get("CHART_METRICS"):
+    configure(os.environ.get("CHART_TRACE"), os.environ.get("CHART_METRICS"))
@@ -5,56 +5,86 @@ import numpy as np
 import pandas as pd
 import altair as alt
 from typing import Optional, Dict, Any
+from generators import raster
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, value_table
 
 class PieGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200):
-        super().__init__(output_dir, img_format, width, height)
+    name = "pie"
+    size_param = "num_slices"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    backends = ("raster",)
+    qa_columns = ("Category", "Value")
+
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200,
+                 sink=None, backend: Optional[str] = None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, backend, sizes=sizes)
     
-    def generate(self, seed: int = 0, num_slices: int = 4, question_template: Optional[str] = "Which category has the largest proportion?",
-                 **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
-        
-        category_label = kwargs.get("x_label") or "Category"
-        values_label = kwargs.get("y_label") or "Value"
-        title = kwargs.get("title") or f"Pie Chart of {values_label}"
+    def synthesize(self, seed: int = 0, num_slices: int = 4, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
+
         categories = kwargs.get("categories") or [chr(65+i) for i in range(num_slices)]
         if (len(categories) != num_slices):
             categories = [chr(65+i) for i in range(num_slices)]
 
-        values = [random.randint(10, 100) for _ in categories]
-        df = pd.DataFrame({'Category': categories, 'Value': values})
+        df = value_table(np_rng, categories, 10, 100)
         df['Percentage'] = df['Value'] / df['Value'].sum()
 
-        color_scheme = random.choice(['category10', 'set2'])
-
-        chart = alt.Chart(df).mark_arc(innerRadius=0).encode(
-            theta=alt.Theta(field="Value", type="quantitative"),
-            color=alt.Color("Category", title=category_label, scale=alt.Scale(scheme=color_scheme)),
-            tooltip=["Category", "Value"]
-        ).properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
-
-        filename = f"PieChart"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(os.path.join(self.output_dir, 
-                                               f"{filename}.{self.img_format}"), 
-                                               size=self.width,
-                                               overlay_rgba=bgcolor)
+        color_scheme = rng.choice(['category10', 'set2'])
 
         max_category = df.loc[df['Value'].idxmax(), 'Category']
-        metadata = {
-            "filename": f"{filename}.{self.img_format}",
-            "chart_type": "pie",
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
             "max_category": max_category,
             "variation": {
                 "color_scheme": color_scheme,
                 "num_slices": num_slices
             },
-            "question": question_template,
             "answer": max_category
         }
+
+    def generate(self, seed: int = 0, num_slices: int = 4, question_template: Optional[str] = "Which category has the largest proportion?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_slices=num_slices, **kwargs)
+        df = synth["data"]
+
+        category_label = kwargs.get("x_label") or "Category"
+        values_label = kwargs.get("y_label") or "Value"
+        title = kwargs.get("title") or f"Pie Chart of {values_label}"
+
+        def build(data):
+            chart = alt.Chart(data).mark_arc(innerRadius=0).encode(
+                theta=alt.Theta(field="Value", type="quantitative"),
+                color=alt.Color("Category", title=category_label,
+                                scale=alt.Scale(scheme=synth["variation"]["color_scheme"])),
+                tooltip=["Category", "Value"]
+            ).properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
+            return chart
+
+        if self.backend == "raster":
+            rendered = self._render_raster(raster.pie, df, self.width, self.height, title, category_label,
+                                           synth["variation"]["color_scheme"])
+        else:
+            rendered = self._render_chart(self._chart_spec(df, build, variation=synth["variation"],
+                                                           category_label=category_label, title=title))
+
+        filename = self._output_name("PieChart", seed,
+                                     num_slices=num_slices,
+                                     question_template=question_template, **kwargs)
+        self._save_images(rendered, filename, overlay_rgba=synth["bgcolor"])
+
+        metadata = {
+            "filename": f"{filename}.{self.img_format}",
+            "chart_type": "pie",
+            "max_category": synth["max_category"],
+            "variation": synth["variation"],
+            "question": question_template,
+            "answer": synth["answer"]
+        }
         self._save_metadata(metadata, filename)
         return filename
 
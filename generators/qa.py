@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import random
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Multiple-choice questions derived from a chart's own data.
+#
+# A generator declares qa_columns = (label, value): the columns of
+# synthesize()["data"] holding what the chart shows per label. Labels that
+# repeat (stacked charts) are summed, so questions are about the visible
+# totals. Options are shuffled with random.Random(seed), so the same chart
+# always gets the same questions in the same order.
+
+KINDS = ("argmax", "argmin", "comparison", "sum", "proportion", "count")
+
+LETTERS = "ABCDEFGHIJ"
+
+
+def _number(value: float) -> str:
+    return f"{float(value):.2f}".rstrip("0").rstrip(".")
+
+
+def _question(rng: random.Random, chart_type: str, kind: str, text: str,
+              answer: str, distractors: Sequence[str]) -> Dict[str, Any]:
+    options = [answer] + list(distractors)
+    rng.shuffle(options)
+    return {
+        "type": chart_type,
+        "kind": kind,
+        "question": text,
+        "options": [{LETTERS[i]: o} for i, o in enumerate(options)],
+        "correct_answer": LETTERS[options.index(answer)],
+        "answer": answer
+    }
+
+
+def _nearby(rng: random.Random, answer: str, candidates: Sequence[float],
+            fmt: Callable[[float], str], n: int) -> List[str]:
+    # distinct wrong answers close to the right one
+    unique = list(dict.fromkeys(s for s in map(fmt, candidates) if s != answer))
+    return rng.sample(unique, min(n, len(unique)))
+
+
+def table(generator, synth: Dict[str, Any]) -> Optional["pd.Series"]:
+    """Value per label as shown in the chart, or None if the chart type has no qa_columns."""
+    if generator.qa_columns is None:
+        return None
+    label, value = generator.qa_columns
+    return synth["data"].groupby(label, sort=False)[value].sum()
+
+
+def questions(generator, synth: Dict[str, Any], seed: int = 0, n_options: int = 4,
+              kinds: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    values = table(generator, synth)
+    if values is None or len(values) < 2:
+        return []
+    rng = random.Random(seed)
+    chart_type = generator.name
+    noun, nouns = generator.qa_noun
+    measure = generator.qa_measure
+    if len(values) < len(synth["data"]):
+        measure = f"total {measure}"
+    labels = [str(label) for label in values.index]
+    numbers = values.to_numpy(dtype=float)
+    total = numbers.sum()
+    kinds = [k for k in (kinds or KINDS) if generator.qa_kinds is None or k in generator.qa_kinds]
+    if len(synth.get("shown", synth["data"])) < len(synth["data"]):
+        # only part of the data is drawn, so only ask what the image still shows
+        kinds = [k for k in kinds if k in generator.qa_thinned_kinds]
+    result = []
+
+    for kind in kinds:
+        if kind in ("argmax", "argmin"):
+            best = numbers.max() if kind == "argmax" else numbers.min()
+            if (numbers == best).sum() != 1:
+                # ties have no single right answer
+                continue
+            answer = labels[int((numbers == best).argmax())]
+            others = [label for label in labels if label != answer]
+            text = f"Which {noun} has the {'highest' if kind == 'argmax' else 'lowest'} {measure}?"
+            result.append(_question(rng, chart_type, kind, text, answer,
+                                    rng.sample(others, min(n_options - 1, len(others)))))
+        elif kind == "comparison":
+            i, j = rng.sample(range(len(labels)), 2)
+            if numbers[i] == numbers[j]:
+                continue
+            answer = labels[i] if numbers[i] > numbers[j] else labels[j]
+            other = labels[j] if answer == labels[i] else labels[i]
+            text = f"Which {noun} has the higher {measure}, {labels[i]} or {labels[j]}?"
+            result.append(_question(rng, chart_type, kind, text, answer, [other]))
+        elif kind == "sum":
+            # wrong totals are rounded like the right one, so none stands out
+            fmt = (lambda v: str(round(v))) if (numbers == numbers.round()).all() else _number
+            answer = fmt(total)
+            text = f"What is the sum of all {nouns}' {generator.qa_measure}s?"
+            candidates = [total * f for f in (0.5, 0.6, 0.7, 0.8, 0.9, 1.1, 1.2, 1.3, 1.4, 1.5)]
+            result.append(_question(rng, chart_type, kind, text, answer,
+                                    _nearby(rng, answer, candidates, fmt, n_options - 1)))
+        elif kind == "proportion":
+            i = rng.randrange(len(labels))
+            share = 100 * numbers[i] / total
+
+            def percent(v: float) -> str:
+                return f"{round(min(max(v, 0), 100))}%"
+
+            answer = percent(share)
+            text = f"What share of the total does {labels[i]} account for?"
+            candidates = [share + d for d in (-15, -10, -5, 5, 10, 15)] + [share * 2, share / 2]
+            result.append(_question(rng, chart_type, kind, text, answer,
+                                    _nearby(rng, answer, candidates, percent, n_options - 1)))
+        elif kind == "count":
+            answer = str(len(labels))
+            text = f"How many {nouns} are shown in the chart?"
+            candidates = [len(labels) + d for d in (-3, -2, -1, 1, 2, 3) if len(labels) + d > 0]
+            result.append(_question(rng, chart_type, kind, text, answer,
+                                    _nearby(rng, answer, candidates, str, n_options - 1)))
+        else:
+            raise ValueError(f"unknown question kind {kind!r}, expected one of {', '.join(KINDS)}")
+    return result
+
+
+class QAStore:
+    """Append-only question store, written batch_size rows at a time.
+
+    A path ending in .jsonl gets one JSON line per question appended to it. A
+    .parquet path is written as numbered parts <root>-NNNNN.parquet next to it,
+    one per flush, numbered after any existing parts, so rows already written
+    are never rewritten. In Parquet, options are kept as a JSON string.
+    """
+
+    def __init__(self, path: str, batch_size: int = 4096):
+        self.parquet = path.endswith(".parquet")
+        if self.parquet:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("Parquet output requires pyarrow (pip install pyarrow); "
+                                  "use a .jsonl path instead") from e
+        self.path = path
+        self.batch_size = batch_size
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._part = self._next_part() if self.parquet else 0
+
+    def _next_part(self) -> int:
+        root = os.path.splitext(self.path)[0]
+        pattern = re.compile(re.escape(os.path.basename(root)) + r"-(\d+)\.parquet$")
+        existing = [int(m.group(1)) for p in glob.glob(f"{root}-*.parquet")
+                    if (m := pattern.search(os.path.basename(p)))]
+        return max(existing) + 1 if existing else 0
+
+    def write(self, rows: Sequence[Dict[str, Any]]):
+        with self._lock:
+            self._rows.extend(rows)
+            if len(self._rows) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        if self.parquet:
+            import pandas as pd
+            path = f"{os.path.splitext(self.path)[0]}-{self._part:05d}.parquet"
+            rows = [dict(row, options=json.dumps(row["options"])) for row in self._rows]
+            pd.DataFrame(rows).to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+            self._part += 1
+        else:
+            # a single write, so concurrent appenders never interleave mid-line
+            with open(self.path, "a") as f:
+                f.write("".join(json.dumps(row) + "\n" for row in self._rows))
+        self._rows = []
+
+    def close(self):
+        self.flush()
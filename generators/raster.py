@@ -0,0 +1,250 @@
+import functools
+import math
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+# Charts drawn straight into a PIL image, for generators created with
+# backend="raster".
+#
+# Layout and colours follow Vega-Lite's defaults closely enough for training
+# data (a width x height plot area, nice linear scales from zero, grid lines,
+# the same colour schemes), but this is not a reimplementation of Vega: lines
+# are straight segments and labels are never rotated or thinned. There is no
+# JavaScript runtime or PNG round trip, so a chart costs well under a
+# millisecond to draw.
+
+SCHEMES = {
+    "category10": ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+                   "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"],
+    "dark2": ["#1b9e77", "#d95f02", "#7570b3", "#e7298a", "#66a61e", "#e6ab02", "#a6761d", "#666666"],
+    "set2": ["#66c2a5", "#fc8d62", "#8da0cb", "#e78ac3", "#a6d854", "#ffd92f", "#e5c494", "#b3b3b3"],
+    "tableau10": ["#4c78a8", "#f58518", "#e45756", "#72b7b2", "#54a24b",
+                  "#eeca3b", "#b279a2", "#ff9da6", "#9d755d", "#bab0ac"],
+}
+
+PAD = 5
+TICK = 5
+LABEL_SIZE = 10
+AXIS_TITLE_SIZE = 11
+TITLE_SIZE = 13
+SWATCH = 10
+
+TEXT = "#000000"
+DOMAIN = "#888888"
+GRID = "#dddddd"
+
+
+@functools.lru_cache(maxsize=None)
+def font(size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.load_default(size=size)
+
+
+@functools.lru_cache(maxsize=4096)
+def _text(text: str, size: int, vertical: bool = False) -> Image.Image:
+    # Tick labels, titles and legend entries repeat from chart to chart, so each is
+    # rasterized once and afterwards only pasted through as a mask
+    f = font(size)
+    ascent, descent = f.getmetrics()
+    mask = Image.new("L", (math.ceil(f.getlength(text)) + 1, ascent + descent), 0)
+    ImageDraw.Draw(mask).text((0, 0), text, fill=255, font=f)
+    return mask.rotate(90, expand=True) if vertical else mask
+
+
+def colors(scheme: str, labels: Sequence) -> Dict:
+    """Colour per label, assigned in sorted label order like Vega's ordinal domains."""
+    palette = SCHEMES[scheme]
+    return {label: palette[i % len(palette)] for i, label in enumerate(sorted(set(labels)))}
+
+
+def linear_ticks(lo: float, hi: float, count: int) -> Tuple[float, float, List[float]]:
+    """Domain widened to round numbers, and the ticks in it, like Vega's nice zero-based scales."""
+    lo, hi = min(lo, 0.0), max(hi, 0.0)
+    if hi <= lo:
+        hi = lo + 1
+    raw = (hi - lo) / max(count, 1)
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw)
+    lo, hi = math.floor(lo / step) * step, math.ceil(hi / step) * step
+    ticks = [lo + i * step for i in range(int(round((hi - lo) / step)) + 1)]
+    return lo, hi, ticks
+
+
+def tick_label(value: float, step: float) -> str:
+    decimals = max(0, -math.floor(math.log10(step))) if step > 0 else 0
+    return f"{value:,.{decimals}f}"
+
+
+class Canvas:
+    """A width x height plot area with room around it for a title, axes and a legend."""
+
+    def __init__(self, width: int, height: int, title: str = "", left: int = 0, bottom: int = 0,
+                 right: int = 0):
+        self.width = width
+        self.height = height
+        self.left = PAD + left
+        self.top = PAD + (TITLE_SIZE + 9 if title else 0)
+        self.image = Image.new("RGB", (self.left + width + right + PAD, self.top + height + bottom + PAD), "white")
+        self.draw = ImageDraw.Draw(self.image, "RGBA")
+        if title:
+            self.text((self.left + width / 2, PAD), title, TITLE_SIZE, "mt")
+
+    def text(self, xy: Tuple[float, float], text: str, size: int = LABEL_SIZE, anchor: str = "lt",
+             vertical: bool = False):
+        """Draw text anchored like PIL's: l/m/r horizontally, t/m vertically."""
+        mask = _text(text, size, vertical)
+        x = xy[0] - {"l": 0, "m": mask.width / 2, "r": mask.width}[anchor[0]]
+        y = xy[1] - {"t": 0, "m": mask.height / 2}[anchor[1]]
+        x, y = int(round(x)), int(round(y))
+        self.image.paste(TEXT, (x, y, x + mask.width, y + mask.height), mask)
+
+    def x(self, frac: float) -> float:
+        return self.left + frac * self.width
+
+    def y(self, frac: float) -> float:
+        return self.top + (1 - frac) * self.height
+
+    def y_axis(self, ticks: Sequence[Tuple[float, str]], title: str, grid: bool = True):
+        x0 = self.left
+        for frac, label in ticks:
+            y = self.y(frac)
+            if grid:
+                self.draw.line([(x0, y), (x0 + self.width, y)], fill=GRID)
+            self.draw.line([(x0 - TICK, y), (x0, y)], fill=DOMAIN)
+            self.text((x0 - TICK - 2, y), label, anchor="rm")
+        self.draw.line([(x0, self.top), (x0, self.top + self.height)], fill=DOMAIN)
+        if title:
+            self.text((PAD, self.top + self.height / 2), title, AXIS_TITLE_SIZE, "lm", vertical=True)
+
+    def x_axis(self, ticks: Sequence[Tuple[float, str]], title: str, grid: bool = True):
+        y0 = self.top + self.height
+        for frac, label in ticks:
+            x = self.x(frac)
+            if grid:
+                self.draw.line([(x, self.top), (x, y0)], fill=GRID)
+            self.draw.line([(x, y0), (x, y0 + TICK)], fill=DOMAIN)
+            self.text((x, y0 + TICK + 2), label, anchor="mt")
+        self.draw.line([(self.left, y0), (self.left + self.width, y0)], fill=DOMAIN)
+        if title:
+            self.text((self.left + self.width / 2, y0 + TICK + LABEL_SIZE + 8), title, AXIS_TITLE_SIZE, "mt")
+
+    def legend(self, title: str, entries: Sequence[Tuple[str, str]], circle: bool = False):
+        x = self.left + self.width + 18
+        y = self.top
+        if title:
+            self.text((x, y), title, AXIS_TITLE_SIZE)
+            y += AXIS_TITLE_SIZE + 6
+        for label, color in entries:
+            box = (x, y, x + SWATCH, y + SWATCH)
+            if circle:
+                self.draw.ellipse(box, fill=color)
+            else:
+                self.draw.rectangle(box, fill=color)
+            self.text((x + SWATCH + 4, y + SWATCH / 2), label, anchor="lm")
+            y += SWATCH + 6
+
+
+def _text_width(texts: Sequence[str], size: int) -> int:
+    return math.ceil(max((font(size).getlength(t) for t in texts), default=0))
+
+
+def _left_margin(labels: Sequence[str], title: str) -> int:
+    return _text_width(labels, LABEL_SIZE) + TICK + 4 + (AXIS_TITLE_SIZE + 8 if title else 0)
+
+
+def _bottom_margin(title: str) -> int:
+    return TICK + LABEL_SIZE + 6 + (AXIS_TITLE_SIZE + 6 if title else 0)
+
+
+def _legend_width(title: str, labels: Sequence[str]) -> int:
+    return 18 + max(_text_width([title], AXIS_TITLE_SIZE), SWATCH + 4 + _text_width(labels, LABEL_SIZE))
+
+
+def _value_axis(values: np.ndarray, size: int) -> Tuple[float, float, List[Tuple[float, str]]]:
+    lo, hi, ticks = linear_ticks(float(values.min()), float(values.max()), max(2, size // 40))
+    step = ticks[1] - ticks[0]
+    return lo, hi, [((t - lo) / (hi - lo), tick_label(t, step)) for t in ticks]
+
+
+def bar(df: pd.DataFrame, width: int, height: int, title: str, x_label: str, values_label: str,
+        color_scheme: str, orientation: str) -> Image.Image:
+    labels = [str(c) for c in df["Category"]]
+    values = df["Value"].to_numpy(dtype=float)
+    palette = colors(color_scheme, labels)
+    legend = [(label, palette[label]) for label in sorted(palette)]
+    lo, hi, value_ticks = _value_axis(values, width if orientation == "horizontal" else height)
+    # band scale: one band per category, 10% of each band left as padding like Vega's bars
+    band = 1 / len(labels)
+    band_ticks = [((i + 0.5) * band, label) for i, label in enumerate(labels)]
+
+    if orientation == "vertical":
+        canvas = Canvas(width, height, title, left=_left_margin([t for _, t in value_ticks], values_label),
+                        bottom=_bottom_margin(x_label), right=_legend_width(x_label, labels))
+        canvas.y_axis(value_ticks, values_label)
+        canvas.x_axis(band_ticks, x_label, grid=False)
+        for i, (label, value) in enumerate(zip(labels, values)):
+            x0, x1 = canvas.x((i + 0.05) * band), canvas.x((i + 0.95) * band)
+            canvas.draw.rectangle((x0, canvas.y((value - lo) / (hi - lo)), x1, canvas.y(-lo / (hi - lo))),
+                                  fill=palette[label])
+    else:
+        canvas = Canvas(width, height, title, left=_left_margin(labels, x_label),
+                        bottom=_bottom_margin(values_label), right=_legend_width(x_label, labels))
+        canvas.x_axis(value_ticks, values_label)
+        # categories run top to bottom, as on Vega's y band axis
+        canvas.y_axis([(1 - frac, label) for frac, label in band_ticks], x_label, grid=False)
+        for i, (label, value) in enumerate(zip(labels, values)):
+            y0, y1 = canvas.y(1 - (i + 0.05) * band), canvas.y(1 - (i + 0.95) * band)
+            canvas.draw.rectangle((canvas.x(-lo / (hi - lo)), y0, canvas.x((value - lo) / (hi - lo)), y1),
+                                  fill=palette[label])
+    canvas.legend(x_label, legend)
+    return canvas.image
+
+
+def pie(df: pd.DataFrame, width: int, height: int, title: str, category_label: str,
+        color_scheme: str) -> Image.Image:
+    labels = [str(c) for c in df["Category"]]
+    values = df["Value"].to_numpy(dtype=float)
+    palette = colors(color_scheme, labels)
+    canvas = Canvas(width, height, title, right=_legend_width(category_label, labels))
+    radius = min(width, height) / 2
+    cx, cy = canvas.x(0.5), canvas.y(0.5)
+    box = (cx - radius, cy - radius, cx + radius, cy + radius)
+    # clockwise from 12 o'clock in data order; PIL measures angles clockwise from 3 o'clock
+    angles = -90 + 360 * np.concatenate([[0], np.cumsum(values)]) / values.sum()
+    for label, start, end in zip(labels, angles[:-1], angles[1:]):
+        canvas.draw.pieslice(box, float(start), float(end), fill=palette[label])
+    canvas.legend(category_label, [(label, palette[label]) for label in sorted(palette)])
+    return canvas.image
+
+
+def _series(df: pd.DataFrame, width: int, height: int, title: str, x_label: str, y_label: str):
+    xs = df["x"].to_numpy(dtype=float)
+    ys = df["y"].to_numpy(dtype=float)
+    x_lo, x_hi, x_ticks = _value_axis(xs, width)
+    y_lo, y_hi, y_ticks = _value_axis(ys, height)
+    canvas = Canvas(width, height, title, left=_left_margin([t for _, t in y_ticks], y_label),
+                    bottom=_bottom_margin(x_label), right=_text_width([x_ticks[-1][1]], LABEL_SIZE) // 2)
+    canvas.y_axis(y_ticks, y_label)
+    canvas.x_axis(x_ticks, x_label)
+    points = [(canvas.x((x - x_lo) / (x_hi - x_lo)), canvas.y((y - y_lo) / (y_hi - y_lo))) for x, y in zip(xs, ys)]
+    return canvas, points, canvas.y(-y_lo / (y_hi - y_lo))
+
+
+def line(df: pd.DataFrame, width: int, height: int, title: str, x_label: str, y_label: str,
+         color: str, markers: bool = True) -> Image.Image:
+    canvas, points, _ = _series(df, width, height, title, x_label, y_label)
+    canvas.draw.line(points, fill=color, width=2, joint="curve")
+    if markers:
+        for x, y in points:
+            canvas.draw.ellipse((x - 3, y - 3, x + 3, y + 3), fill=color)
+    return canvas.image
+
+
+def area(df: pd.DataFrame, width: int, height: int, title: str, x_label: str, y_label: str,
+         color: str) -> Image.Image:
+    canvas, points, baseline = _series(df, width, height, title, x_label, y_label)
+    # Vega's default area opacity is 0.7
+    r, g, b = ImageColor.getrgb(color)[:3]
+    canvas.draw.polygon([(points[0][0], baseline)] + points + [(points[-1][0], baseline)], fill=(r, g, b, 178))
+    return canvas.image
@@ -0,0 +1,64 @@
+import importlib
+import threading
+from typing import Dict, Iterable, List, Type
+from generators.generator import ChartGenerator
+
+# chart type -> (label shown in the app, "module:Class"). Generator modules, and the
+# altair / plotly stack they pull in, are only imported the first time a type is used;
+# everything else about a type (size_param, defaults, backend) is declared on its class.
+GENERATORS = {
+    "area": ("Area Chart", "generators.area_generator:AreaGenerator"),
+    "bar": ("Bar Chart", "generators.bar_generator:BarGenerator"),
+    "bubble": ("Bubble Chart", "generators.bubble_generator:BubbleGenerator"),
+    "choropleth": ("Choropleth Map", "generators.choropleth_generator:ChoroplethGenerator"),
+    "line": ("Line Chart", "generators.line_generator:LineGenerator"),
+    "pie": ("Pie Chart", "generators.pie_generator:PieGenerator"),
+    "scatter": ("Scatter Chart", "generators.scatter_generator:ScatterGenerator"),
+    "stacked_area": ("Stacked Area Chart", "generators.stackedarea_generator:StackedAreaGenerator"),
+    "stacked_bar": ("Stacked Bar Chart", "generators.stackedbar_generator:StackedBarGenerator"),
+    "treemap": ("Treemap", "generators.treemap_generator:TreeMapGenerator"),
+    "histogram": ("Histogram", "generators.histogram_generator:HistogramGenerator"),
+    "stacked_bar_100": ("100% Stacked Bar Chart", "generators.stacked100_generator:Stacked100Generator"),
+}
+
+_classes: Dict[str, Type[ChartGenerator]] = {}
+_lock = threading.Lock()
+
+
+def names() -> List[str]:
+    return list(GENERATORS)
+
+
+def labels() -> Dict[str, str]:
+    """App label -> chart type."""
+    return {label: name for name, (label, _) in GENERATORS.items()}
+
+
+def load(name: str) -> Type[ChartGenerator]:
+    cls = _classes.get(name)
+    if cls is not None:
+        return cls
+    if name not in GENERATORS:
+        raise KeyError(f"Unknown chart type: {name}")
+    module_name, class_name = GENERATORS[name][1].split(":")
+    with _lock:
+        if name not in _classes:
+            cls = getattr(importlib.import_module(module_name), class_name)
+            if cls.name != name:
+                raise TypeError(f"{module_name}.{class_name} declares name {cls.name!r}, registered as {name!r}")
+            _classes[name] = cls
+    return _classes[name]
+
+
+def create(name: str, **kwargs) -> ChartGenerator:
+    """Instantiate a chart type with its declared defaults, overridden by kwargs."""
+    cls = load(name)
+    return cls(**{**cls.defaults, **kwargs})
+
+
+def by_backend(names: Iterable[str]) -> Dict[str, List[str]]:
+    """Group chart types by renderer backend, e.g. to keep each worker on one renderer."""
+    groups: Dict[str, List[str]] = {}
+    for name in names:
+        groups.setdefault(load(name).backend, []).append(name)
+    return groups
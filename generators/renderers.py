@@ -0,0 +1,177 @@
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+# An altair chart, a Vega-Lite spec dict, or its JSON string. altair itself is
+# only imported once a VegaRenderer is created, to keep plotly-only processes light.
+Spec = Union[Any, Dict[str, Any], str]
+
+
+class VegaRenderer:
+    """Long-lived Vega-Lite -> PNG converter shared by the Altair generators.
+
+    vl-convert keeps its JavaScript runtime alive between calls, so one renderer
+    per process is enough: it is warmed up once, fonts are registered once, and
+    charts go straight from spec dicts to PNG without the per-call overhead of
+    alt.Chart.save().
+    """
+
+    def __init__(self, scale: float = 1.0, ppi: float = 72, theme: Optional[str] = None,
+                 config: Optional[Dict[str, Any]] = None, font_dirs: Sequence[str] = (),
+                 warm: bool = True):
+        import altair as alt
+        import vl_convert
+        self._alt = alt
+        self._vlc = vl_convert
+        # vl-convert wants the Vega-Lite version altair's schema targets, e.g. "v5_20"
+        self.vl_version = "_".join(alt.SCHEMA_VERSION.split(".")[:2])
+        self.scale = scale
+        self.ppi = ppi
+        self.theme = theme
+        self.config = config
+        for font_dir in font_dirs:
+            self._vlc.register_font_directory(font_dir)
+        if warm:
+            self.render({"data": {"values": [{"x": 0}]}, "mark": "point",
+                         "encoding": {"x": {"field": "x", "type": "quantitative"}}})
+
+    def to_spec(self, chart: Spec) -> Union[Dict[str, Any], str]:
+        if isinstance(chart, (dict, str)):
+            return chart
+        # Same data handling as alt.Chart.save(); the generators build fixed,
+        # known-good specs, so schema validation is skipped on the hot path.
+        with self._alt.data_transformers.disable_max_rows():
+            return chart.to_dict(validate=False, context={"pre_transform": False})
+
+    def to_values(self, data) -> List[Dict[str, Any]]:
+        """A DataFrame as inline Vega-Lite records, sanitized exactly like altair does."""
+        return self._alt.utils.data.to_values(data)["values"]
+
+    def render(self, chart: Spec) -> bytes:
+        return self._vlc.vegalite_to_png(
+            self.to_spec(chart),
+            vl_version=self.vl_version,
+            scale=self.scale,
+            ppi=self.ppi,
+            theme=self.theme,
+            config=self.config,
+        )
+
+    def render_svg(self, chart: Spec) -> str:
+        return self._vlc.vegalite_to_svg(
+            self.to_spec(chart),
+            vl_version=self.vl_version,
+            theme=self.theme,
+            config=self.config,
+        )
+
+    def render_many(self, charts: Iterable[Spec]) -> List[bytes]:
+        return [self.render(chart) for chart in charts]
+
+
+_FONT_FAMILY = re.compile(r"font-family:\s*([^;\"]*?)\s*(?=[;\"])")
+_GENERIC_FAMILIES = ("serif", "sans-serif", "monospace", "cursive", "fantasy")
+
+
+def _with_fallback(match: "re.Match") -> str:
+    families = match.group(1)
+    if families.rstrip().rsplit(",", 1)[-1].strip().strip("'\"") in _GENERIC_FAMILIES:
+        return match.group(0)
+    return f"font-family: {families}, sans-serif"
+
+
+def rasterize(svg: str, scale: float = 1.0, ppi: float = 72) -> bytes:
+    """PNG of an SVG from either renderer, through the same resvg rasterizer vl-convert uses for its PNGs."""
+    import vl_convert
+    # Unlike a browser, resvg draws no text at all in a font it can't find, and Plotly
+    # names exact fonts ('Open Sans', 'Arial Black'); Vega's SVGs are left untouched.
+    return vl_convert.svg_to_png(_FONT_FAMILY.sub(_with_fallback, svg), scale=scale, ppi=ppi)
+
+
+class KaleidoRenderer:
+    """Long-lived Kaleido export session for the Plotly generators.
+
+    Wraps plotly's Chromium-backed Kaleido scope so the subprocess, and the map
+    geometry plotly.js has already fetched into it, survives between exports.
+    The process is restarted after `max_exports` exports, after `max_idle`
+    seconds without use, when it has died, or once when an export fails.
+    """
+
+    def __init__(self, topojson: Optional[str] = None, mathjax: Optional[str] = None,
+                 max_exports: Optional[int] = 5000, max_idle: Optional[float] = 600.0,
+                 retries: int = 1, warm: bool = True):
+        import plotly.io as pio
+        self._scope = pio.kaleido.scope
+        if self._scope is None:
+            raise ImportError("Exporting Plotly charts requires the kaleido package")
+        # No LaTeX in our charts; skipping MathJax avoids loading it on every start
+        self._scope.mathjax = mathjax
+        if topojson is not None:
+            # A local mirror of https://cdn.plot.ly/<scope>_<res>.json files
+            self._scope.topojson = Path(topojson).absolute().as_uri() if os.path.isdir(topojson) else topojson
+        self.max_exports = max_exports
+        self.max_idle = max_idle
+        self.retries = retries
+        self.exports = 0
+        self.restarts = 0
+        self._last_used = time.monotonic()
+        self._lock = threading.Lock()
+        if warm:
+            self.start()
+
+    def is_healthy(self) -> bool:
+        proc = self._scope._proc
+        return proc is not None and proc.poll() is None
+
+    def start(self):
+        self._scope._ensure_kaleido()
+        self._last_used = time.monotonic()
+
+    def restart(self):
+        self._scope._shutdown_kaleido()
+        self.exports = 0
+        self.restarts += 1
+        self.start()
+
+    def shutdown(self):
+        self._scope._shutdown_kaleido()
+
+    def _check(self):
+        idle = time.monotonic() - self._last_used
+        if self._scope._proc is None:
+            self.start()
+        elif (not self.is_healthy()
+              or (self.max_exports is not None and self.exports >= self.max_exports)
+              or (self.max_idle is not None and idle > self.max_idle)):
+            self.restart()
+
+    def render(self, fig, width: Optional[int] = None, height: Optional[int] = None,
+               format: str = "png") -> bytes:
+        figure = fig.to_dict() if hasattr(fig, "to_dict") else fig
+        with self._lock:
+            self._check()
+            for attempt in range(self.retries + 1):
+                try:
+                    image = self._scope.transform(figure, format=format, width=width, height=height)
+                    break
+                except ValueError:
+                    if attempt == self.retries:
+                        raise
+                    self.restart()
+            self.exports += 1
+            self._last_used = time.monotonic()
+        return image
+
+    def render_many(self, figs: Iterable[Any], width: Optional[int] = None,
+                    height: Optional[int] = None, format: str = "png") -> List[bytes]:
+        return [self.render(fig, width, height, format) for fig in figs]
+
+    def write_images(self, figs: Iterable[Any], paths: Iterable[str],
+                     width: Optional[int] = None, height: Optional[int] = None):
+        for fig, path in zip(figs, paths):
+            image = self.render(fig, width, height, format=os.path.splitext(path)[1][1:] or "png")
+            with open(path, "wb") as f:
+                f.write(image)
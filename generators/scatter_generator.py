@@ -6,60 +6,88 @@ import pandas as pd
 import altair as alt
 from typing import Optional, Dict, Any
 from generators.generator import ChartGenerator
+from generators.downsample import grid_frame
+from generators.synthesis import data_rng
 
 class ScatterGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200):
-        super().__init__(output_dir, img_format, width, height)
+    name = "scatter"
+    size_param = "num_points"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
 
-    def generate(self, seed: int = 0, num_points: int = 10, 
-                 question_template: Optional[str] = "What is the x value of point that is the farthest from the origin?",
-                 **kwargs):
-        random.seed(seed)
-        np.random.seed(seed)
-        bgcolor = self._random_rgba()
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 200,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, num_points: int = 10, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
 
         points = pd.DataFrame({
-            'x': np.random.uniform(10, 100, num_points),
-            'y': np.random.uniform(10, 100, num_points),
+            'x': np_rng.uniform(10, 100, num_points),
+            'y': np_rng.uniform(10, 100, num_points),
         })
         points['distance'] = np.sqrt(points['x']**2 + points['y']**2)
         farthest_x = points.loc[points['distance'].idxmax(), 'x']
+        # Dense scatters are thinned to one point per 4x4 pixel cell, about a marker's
+        # size; each cell keeps its point farthest from the origin, so the answer stays
+        shown = grid_frame(points, 'x', 'y', 'distance', max(self.width // 4, 1), max(self.height // 4, 1))
+
+        color_scheme = rng.choice(['red', 'blue', 'teal', 'orange'])
+        shape_options = ['circle', 'square', 'triangle']
+        point_shape = rng.choice(shape_options)
+        return {
+            "data": points,
+            "shown": shown,
+            "bgcolor": bgcolor,
+            "farthest_x": farthest_x,
+            "variation": {
+                "color_scheme": color_scheme,
+                "point_shape": point_shape,
+                "num_points": num_points
+            },
+            "answer": farthest_x
+        }
 
+    def generate(self, seed: int = 0, num_points: int = 10, 
+                 question_template: Optional[str] = "What is the x value of point that is the farthest from the origin?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_points=num_points, **kwargs)
+        points = synth["data"]
+        variation = synth["variation"]
 
         x_label = kwargs.get("x_label") or "x"
         y_label = kwargs.get("y_label") or "y"
         title = kwargs.get("title") or f"Scatter Plot between {x_label} and {y_label}"
 
-        color_scheme = random.choice(['red', 'blue', 'teal', 'orange'])
-        shape_options = ['circle', 'square', 'triangle']
-        point_shape = random.choice(shape_options)
+        shown = synth["shown"]
 
         # build chart
-        chart = alt.Chart(points).mark_point(color=color_scheme, filled=True, shape=point_shape).encode(
-            x=alt.X('x:Q', title=x_label),
-            y=alt.Y('y:Q', title=y_label),
-            tooltip=['x', 'y']
-        ).properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
+        def build(data):
+            chart = alt.Chart(data).mark_point(color=variation["color_scheme"], filled=True,
+                                               shape=variation["point_shape"]).encode(
+                x=alt.X('x:Q', title=x_label),
+                y=alt.Y('y:Q', title=y_label),
+                tooltip=['x', 'y']
+            ).properties(width=self.width, height=self.height, title=title).configure_view(stroke=None)
+            return chart
+
+        chart = self._chart_spec(shown, build, variation=variation,
+                                 x_label=x_label, y_label=y_label, title=title)
 
-        filename = f"Scatterplot"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(os.path.join(self.output_dir, 
-                                               f"{filename}.{self.img_format}"), 
-                                               size=self.width,
-                                               overlay_rgba=bgcolor)
+        filename = self._output_name("Scatterplot", seed,
+                                     num_points=num_points,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_chart(chart), filename, overlay_rgba=synth["bgcolor"])
 
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "scatter",
-            "farthest_x": farthest_x,
-            "variation": {
-                "color_scheme": color_scheme,
-                "point_shape": point_shape,
-                "num_points": num_points
-            },
+            "farthest_x": synth["farthest_x"],
+            "variation": variation,
             "question": question_template,
-            "answer": farthest_x
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
@@ -0,0 +1,194 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class FileSink:
+    """Loose <name>.<ext> files under output_dir (the default sink)."""
+
+    def __init__(self, output_dir: str):
+        self.output_dir = output_dir
+
+    def path(self, name: str, ext: str) -> str:
+        return os.path.join(self.output_dir, f"{name}.{ext}")
+
+    def write(self, name: str, ext: str, data: bytes):
+        path = self.path(name, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written to a private temp file and os.replace()d into place,
+        # so concurrent writers never expose a half-written file.
+        root, suffix = os.path.splitext(path)
+        tmp_path = f"{root}.{os.getpid()}-{threading.get_ident()}.tmp{suffix}"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        pass
+
+
+class MemorySink:
+    """Keeps written files in memory, e.g. to ship them from a worker process to a writer."""
+
+    def __init__(self):
+        self.files: List[Tuple[str, str, bytes]] = []
+
+    def write(self, name: str, ext: str, data: bytes):
+        self.files.append((name, ext, data))
+
+    def drain(self) -> List[Tuple[str, str, bytes]]:
+        files, self.files = self.files, []
+        return files
+
+    def close(self):
+        pass
+
+
+class HashingSink:
+    """Passes writes through to another sink and keeps the sha256 of every file written."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.digests: Dict[str, str] = {}
+
+    def write(self, name: str, ext: str, data: bytes):
+        self.digests[f"{name}.{ext}"] = hashlib.sha256(data).hexdigest()
+        self.sink.write(name, ext, data)
+
+    def drain(self) -> Dict[str, str]:
+        digests, self.digests = self.digests, {}
+        return digests
+
+    def close(self):
+        self.sink.close()
+
+
+class TarShardSink:
+    """WebDataset-style tar shards with a Parquet index of the metadata.
+
+    Files of one sample (<name>.png, <name>.json, ...) are stored next to each
+    other, and a new shard is started between samples once the current one
+    exceeds max_shard_bytes. Every shard <prefix>-NNNNN.tar gets a companion
+    <prefix>-NNNNN.parquet with one row per sample (chart_type, variation,
+    question, answer, ...). Shards are written under a .tmp name and renamed
+    when complete, and numbering continues after existing shards, so an
+    interrupted run never leaves a truncated shard behind.
+    """
+
+    def __init__(self, output_dir: str, prefix: str = "shard", max_shard_bytes: int = 1 << 30,
+                 index: bool = True,
+                 on_close: Optional[Callable[[str, List[str]], None]] = None):
+        if index:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("The Parquet index requires pyarrow (pip install pyarrow); "
+                                  "pass index=False to write tar shards only") from e
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_shard_bytes = max_shard_bytes
+        self.index = index
+        self.on_close = on_close
+        os.makedirs(output_dir, exist_ok=True)
+        self._shard = self._next_shard()
+        self._tar: Optional[tarfile.TarFile] = None
+        self._current: Optional[str] = None
+        self._names: List[str] = []
+        self._rows: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _next_shard(self) -> int:
+        pattern = re.compile(re.escape(self.prefix) + r"-(\d+)\.tar$")
+        existing = [int(m.group(1)) for p in glob.glob(os.path.join(self.output_dir, f"{self.prefix}-*.tar"))
+                    if (m := pattern.search(os.path.basename(p)))]
+        return max(existing) + 1 if existing else 0
+
+    def shard_path(self, shard: int) -> str:
+        return os.path.join(self.output_dir, f"{self.prefix}-{shard:05d}.tar")
+
+    def write(self, name: str, ext: str, data: bytes):
+        with self._lock:
+            if name != self._current:
+                if self._tar is not None and self._tar.fileobj.tell() >= self.max_shard_bytes:
+                    self._close_shard()
+                if self._tar is None:
+                    self._tar = tarfile.open(self.shard_path(self._shard) + ".tmp", "w")
+                self._current = name
+                self._names.append(name)
+
+            info = tarfile.TarInfo(f"{name}.{ext}")
+            info.size = len(data)
+            info.mode = 0o644
+            self._tar.addfile(info, io.BytesIO(data))
+
+            if ext == "json" and self.index:
+                self._rows.append(self._index_row(name, data))
+
+    def _index_row(self, name: str, data: bytes) -> Dict[str, Any]:
+        metadata = json.loads(data)
+        # nested fields are kept as JSON strings so every chart type shares one schema
+        return {
+            "key": name,
+            "shard": os.path.basename(self.shard_path(self._shard)),
+            "filename": metadata.get("filename"),
+            "chart_type": metadata.get("chart_type"),
+            "variation": json.dumps(metadata.get("variation"), sort_keys=True),
+            "question": metadata.get("question"),
+            "answer": json.dumps(metadata.get("answer")),
+        }
+
+    def _close_shard(self):
+        path = self.shard_path(self._shard)
+        self._tar.close()
+        os.replace(path + ".tmp", path)
+        if self.index:
+            import pandas as pd
+            pd.DataFrame(self._rows).to_parquet(os.path.splitext(path)[0] + ".parquet", index=False)
+        if self.on_close is not None:
+            self.on_close(path, self._names)
+        self._tar = None
+        self._current = None
+        self._names = []
+        self._rows = []
+        self._shard += 1
+
+    def close(self):
+        with self._lock:
+            if self._tar is not None:
+                self._close_shard()
+
+
+def drop_samples(path: str, names: Iterable[str]) -> Set[str]:
+    """Rewrite a finished shard and its Parquet index without the given samples.
+
+    Returns the samples left in the shard. Reading stops at the first damaged
+    member, so a truncated shard keeps only what comes before it.
+    """
+    names = set(names)
+    kept = set()
+    if os.path.exists(path):
+        with tarfile.open(path + ".tmp", "w") as dst:
+            try:
+                with tarfile.open(path) as src:
+                    for member in src:
+                        sample = member.name.split(".", 1)[0]
+                        if sample not in names:
+                            data = src.extractfile(member).read()
+                            dst.addfile(member, io.BytesIO(data))
+                            kept.add(sample)
+            except (OSError, tarfile.TarError):
+                pass
+        os.replace(path + ".tmp", path)
+    index = os.path.splitext(path)[0] + ".parquet"
+    if os.path.exists(index):
+        import pandas as pd
+        rows = pd.read_parquet(index)
+        rows[rows["key"].isin(kept)].to_parquet(index + ".tmp", index=False)
+        os.replace(index + ".tmp", index)
+    return kept
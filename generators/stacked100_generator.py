@@ -3,23 +3,28 @@ import random
 import json
 import pandas as pd
 import altair as alt
-from typing import Optional
+from typing import Optional, Dict, Any
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, proportion_table
 
 class Stacked100Generator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300):
-        super().__init__(output_dir, img_format, width, height)
+    name = "stacked_bar_100"
+    size_param = "num_categories"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    qa_columns = ("key", "value")
+    qa_noun = ("segment", "segments")
+    qa_kinds = ("argmax", "argmin", "comparison", "count")
 
-    def generate(self, seed: int = 0, num_series: int = 3, num_categories: int = 4,
-                 question_template: Optional[str] = "In which category does a segment occupy the largest proportion?",
-                 **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
 
-        x_label = kwargs.get("x_label") or "Category"
-        series_label = kwargs.get("size_label") or "Series"
-        values_label = kwargs.get("y_label") or "Value"
-        title = kwargs.get("title") or f"100% Stacked Bar Chart of {values_label}"
+    def synthesize(self, seed: int = 0, num_series: int = 3, num_categories: int = 4,
+                   **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
 
         categories = kwargs.get("categories") or [chr(65+i) for i in range(num_categories)]
         if (len(categories) != num_categories):
@@ -29,19 +34,7 @@ class Stacked100Generator(ChartGenerator):
         if (len(series) != num_series):
             series = [f"S{i+1}" for i in range(num_series)]
 
-        data = []
-
-        for cat in categories:
-            proportions = [random.randint(1, 100) for _ in series]
-            total = sum(proportions)
-            for s, val in zip(series, proportions):
-                data.append({
-                    'category': cat,
-                    'series': s,
-                    'value': val / total
-                })
-
-        df = pd.DataFrame(data)
+        df = proportion_table(np_rng, categories, series, 1, 100)
 
         # 找出最大比例 segment
         df['key'] = df['category'] + "-" + df['series']
@@ -49,40 +42,10 @@ class Stacked100Generator(ChartGenerator):
         max_cat = max_segment['category']
         max_series = max_segment['series']
 
-        color_scheme = random.choice(['category10', 'set2', 'dark2'])
-
-        chart = alt.Chart(df).mark_bar().encode(
-            x=alt.X('category:N', title=x_label),
-            y=alt.Y('value:Q', stack='normalize', title=f"Proportion of {values_label}"),
-            color=alt.Color('series:N', scale=alt.Scale(scheme=color_scheme), title=series_label),
-            tooltip=['category', 'series', alt.Tooltip('value:Q', format=".2%")]
-        ).properties(width=self.width, height=self.height, title=title)
-
-        chart = chart.configure_view(
-            stroke=None
-        ).configure_axis(
-            labelFontSize=11, titleFontSize=13,
-            labelColor="#444", titleColor="#222",
-            gridColor="rgba(0,0,0,0.08)"
-        ).configure_legend(
-            labelFontSize=11, titleFontSize=12,
-            strokeColor="rgba(0,0,0,0.1)"
-        )
-
-        # Save
-        filename = f"Stacked100"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(
-            img_path,
-            size=self.width,
-            overlay_rgba=bgcolor,
-            overlay_opacity=0.15
-        )
-
-        metadata = {
-            "filename": f"{filename}.{self.img_format}",
-            "chart_type": "stacked_bar_100",
+        color_scheme = rng.choice(['category10', 'set2', 'dark2'])
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
             "max_segment": {
                 "category": max_cat,
                 "series": max_series
@@ -92,11 +55,61 @@ class Stacked100Generator(ChartGenerator):
                 "num_series": num_series,
                 "num_categories": num_categories
             },
-            "question": question_template,
             "answer": {
                 "category": max_cat,
                 "series": max_series
             }
         }
+
+    def generate(self, seed: int = 0, num_series: int = 3, num_categories: int = 4,
+                 question_template: Optional[str] = "In which category does a segment occupy the largest proportion?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_series=num_series, num_categories=num_categories, **kwargs)
+        df = synth["data"]
+
+        x_label = kwargs.get("x_label") or "Category"
+        series_label = kwargs.get("size_label") or "Series"
+        values_label = kwargs.get("y_label") or "Value"
+        title = kwargs.get("title") or f"100% Stacked Bar Chart of {values_label}"
+
+        def build(data):
+            chart = alt.Chart(data).mark_bar().encode(
+                x=alt.X('category:N', title=x_label),
+                y=alt.Y('value:Q', stack='normalize', title=f"Proportion of {values_label}"),
+                color=alt.Color('series:N', scale=alt.Scale(scheme=synth["variation"]["color_scheme"]),
+                                title=series_label),
+                tooltip=['category', 'series', alt.Tooltip('value:Q', format=".2%")]
+            ).properties(width=self.width, height=self.height, title=title)
+
+            chart = chart.configure_view(
+                stroke=None
+            ).configure_axis(
+                labelFontSize=11, titleFontSize=13,
+                labelColor="#444", titleColor="#222",
+                gridColor="rgba(0,0,0,0.08)"
+            ).configure_legend(
+                labelFontSize=11, titleFontSize=12,
+                strokeColor="rgba(0,0,0,0.1)"
+            )
+
+            return chart
+
+        chart = self._chart_spec(df, build, variation=synth["variation"],
+                                 x_label=x_label, values_label=values_label, series_label=series_label, title=title)
+
+        # Save
+        filename = self._output_name("Stacked100", seed,
+                                     num_series=num_series, num_categories=num_categories,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_chart(chart), filename, overlay_rgba=synth["bgcolor"], overlay_opacity=0.15)
+
+        metadata = {
+            "filename": f"{filename}.{self.img_format}",
+            "chart_type": "stacked_bar_100",
+            "max_segment": synth["max_segment"],
+            "variation": synth["variation"],
+            "question": question_template,
+            "answer": synth["answer"]
+        }
         self._save_metadata(metadata, filename)
         return filename
@@ -3,85 +3,96 @@ import random
 import json
 import pandas as pd
 import altair as alt
-from typing import Optional
+from typing import Optional, Dict, Any
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, series_table
 
 class StackedAreaGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300):
-        super().__init__(output_dir, img_format, width, height)
+    name = "stacked_area"
+    size_param = "num_points"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    qa_columns = ("serie", "value")
+    qa_noun = ("series", "series")
 
-    def generate(self, seed: int = 0, num_series: int = 3, num_points: int = 10,
-                 question_template: Optional[str] = "Which serie has the largest total value?",
-                 **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
-
-        data = []
-        x_vals = list(range(1, num_points + 1))
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
 
-        x_label = kwargs.get("x_label") or "x"
-        values_label = kwargs.get("y_label") or "Value"
-        series_label = kwargs.get("size_label") or "Series"
-        title = kwargs.get("title") or f"Stacked Area Chart of {values_label}"
+    def synthesize(self, seed: int = 0, num_series: int = 3, num_points: int = 10, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
 
         series = kwargs.get("series") or [chr(65+i) for i in range(num_series)]
         if (len(series) != num_series):
             series = [chr(65+i) for i in range(num_series)]
-        
 
-        for se in series:
-            for x in x_vals:
-                data.append({
-                    'x': x,
-                    'serie': se,
-                    'value': random.randint(10, 50)
-                })
-
-        df = pd.DataFrame(data)
+        x_vals = list(range(1, num_points + 1))
+        df = series_table(np_rng, series, x_vals, 10, 50, columns=('serie', 'x', 'value'))
         agg = df.groupby('serie')['value'].sum()
         max_se = agg.idxmax()
 
-        color_scheme = random.choice(['category10', 'set2', 'dark2'])
+        color_scheme = rng.choice(['category10', 'set2', 'dark2'])
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
+            "max_serie": max_se,
+            "variation": {
+                "color_scheme": color_scheme,
+                "num_series": num_series,
+                "num_points": num_points,
+            },
+            "answer": max_se
+        }
+
+    def generate(self, seed: int = 0, num_series: int = 3, num_points: int = 10,
+                 question_template: Optional[str] = "Which serie has the largest total value?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_series=num_series, num_points=num_points, **kwargs)
+        df = synth["data"]
+
+        x_label = kwargs.get("x_label") or "x"
+        values_label = kwargs.get("y_label") or "Value"
+        series_label = kwargs.get("size_label") or "Series"
+        title = kwargs.get("title") or f"Stacked Area Chart of {values_label}"
+
+        def build(data):
+            chart = alt.Chart(data).mark_area(interpolate='monotone').encode(
+                x=alt.X('x:O', title=x_label),
+                y=alt.Y('value:Q', title=values_label),
+                color=alt.Color('serie:N', title=series_label,
+                                scale=alt.Scale(scheme=synth["variation"]["color_scheme"])),
+                tooltip=['serie', 'x', 'value']
+            ).properties(width=self.width, height=self.height, title=title)
 
-        chart = alt.Chart(df).mark_area(interpolate='monotone').encode(
-            x=alt.X('x:O', title=x_label),
-            y=alt.Y('value:Q', title=values_label),
-            color=alt.Color('serie:N', title=series_label, scale=alt.Scale(scheme=color_scheme)),
-            tooltip=['serie', 'x', 'value']
-        ).properties(width=self.width, height=self.height, title=title)
+            chart = chart.configure_view(
+                stroke=None
+            ).configure_axis(
+                labelFontSize=11, titleFontSize=13,
+                labelColor="#444", titleColor="#222",
+                gridColor="rgba(0,0,0,0.08)"
+            ).configure_legend(
+                labelFontSize=11, titleFontSize=12,
+                strokeColor="rgba(0,0,0,0.1)"
+            )
+            return chart
 
-        chart = chart.configure_view(
-            stroke=None
-        ).configure_axis(
-            labelFontSize=11, titleFontSize=13,
-            labelColor="#444", titleColor="#222",
-            gridColor="rgba(0,0,0,0.08)"
-        ).configure_legend(
-            labelFontSize=11, titleFontSize=12,
-            strokeColor="rgba(0,0,0,0.1)"
-        )
+        chart = self._chart_spec(df, build, variation=synth["variation"],
+                                 x_label=x_label, values_label=values_label, series_label=series_label, title=title)
 
-        filename = f"StackedArea"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(
-            img_path,
-            size=self.width,
-            overlay_rgba=bgcolor,
-            overlay_opacity=0.15
-        )
+        filename = self._output_name("StackedArea", seed,
+                                     num_series=num_series, num_points=num_points,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_chart(chart), filename, overlay_rgba=synth["bgcolor"], overlay_opacity=0.15)
 
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "stacked_area",
-            "max_serie": max_se,
-            "variation": {
-                "color_scheme": color_scheme,
-                "num_series": num_series,
-                "num_points": num_points,
-            },
+            "max_serie": synth["max_serie"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": max_se
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
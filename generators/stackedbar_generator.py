@@ -3,23 +3,26 @@ import random
 import json
 import pandas as pd
 import altair as alt
-from typing import Optional
+from typing import Optional, Dict, Any
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, series_table
 
 class StackedBarGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300):
-        super().__init__(output_dir, img_format, width, height)
+    name = "stacked_bar"
+    size_param = "num_categories"
+    defaults = {"width": 300, "height": 300}
+    backend = "vega"
+    qa_columns = ("category", "value")
 
-    def generate(self, seed: int = 0, num_series: int = 3, num_categories: int = 4,
-                 question_template: Optional[str] = "Which category has the highest total value?",
-                 **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 300, height: int = 300,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
 
-        x_label = kwargs.get("x_label") or "Category"
-        series_label = kwargs.get("size_label") or "Series"
-        values_label = kwargs.get("y_label") or "Value"
-        title = kwargs.get("title") or f"Stacked Bar Chart of {values_label}"
+    def synthesize(self, seed: int = 0, num_series: int = 3, num_categories: int = 4,
+                   **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
 
         categories = kwargs.get("categories") or [chr(65+i) for i in range(num_categories)]
         if (len(categories) != num_categories):
@@ -29,62 +32,72 @@ class StackedBarGenerator(ChartGenerator):
         if (len(series) != num_series):
             series = [f"S{i+1}" for i in range(num_series)]
 
-        data = []
-
-        for cat in categories:
-            for s in series:
-                data.append({
-                    'category': cat,
-                    'series': s,
-                    'value': random.randint(10, 60)
-                })
-
-        df = pd.DataFrame(data)
+        df = series_table(np_rng, categories, series, 10, 60)
         agg = df.groupby('category')['value'].sum()
         max_cat = agg.idxmax()
 
-        color_scheme = random.choice(['category10', 'set2', 'dark2'])
+        color_scheme = rng.choice(['category10', 'set2', 'dark2'])
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
+            "max_category": max_cat,
+            "variation": {
+                "color_scheme": color_scheme,
+                "num_series": num_series,
+                "num_categories": num_categories
+            },
+            "answer": max_cat
+        }
 
-        chart = alt.Chart(df).mark_bar().encode(
-            x=alt.X('category:N', title=x_label),
-            y=alt.Y('value:Q', stack='zero', title=values_label),
-            color=alt.Color('series:N', scale=alt.Scale(scheme=color_scheme), title=series_label),
-            tooltip=['series', 'category', 'value']
-        ).properties(width=self.width, height=self.height, title=title)
+    def generate(self, seed: int = 0, num_series: int = 3, num_categories: int = 4,
+                 question_template: Optional[str] = "Which category has the highest total value?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_series=num_series, num_categories=num_categories, **kwargs)
+        df = synth["data"]
+
+        x_label = kwargs.get("x_label") or "Category"
+        series_label = kwargs.get("size_label") or "Series"
+        values_label = kwargs.get("y_label") or "Value"
+        title = kwargs.get("title") or f"Stacked Bar Chart of {values_label}"
+
+        def build(data):
+            chart = alt.Chart(data).mark_bar().encode(
+                x=alt.X('category:N', title=x_label),
+                y=alt.Y('value:Q', stack='zero', title=values_label),
+                color=alt.Color('series:N', scale=alt.Scale(scheme=synth["variation"]["color_scheme"]),
+                                title=series_label),
+                tooltip=['series', 'category', 'value']
+            ).properties(width=self.width, height=self.height, title=title)
+
+            chart = chart.configure_view(
+                stroke=None
+            ).configure_axis(
+                labelFontSize=11, titleFontSize=13,
+                labelColor="#444", titleColor="#222",
+                gridColor="rgba(0,0,0,0.08)"
+            ).configure_legend(
+                labelFontSize=11, titleFontSize=12,
+                strokeColor="rgba(0,0,0,0.1)"
+            )
 
-        chart = chart.configure_view(
-            stroke=None
-        ).configure_axis(
-            labelFontSize=11, titleFontSize=13,
-            labelColor="#444", titleColor="#222",
-            gridColor="rgba(0,0,0,0.08)"
-        ).configure_legend(
-            labelFontSize=11, titleFontSize=12,
-            strokeColor="rgba(0,0,0,0.1)"
-        )
+            return chart
+
+        chart = self._chart_spec(df, build, variation=synth["variation"],
+                                 x_label=x_label, values_label=values_label, series_label=series_label, title=title)
 
         # Save
-        filename = f"StackedBar"
-        self._save_chart(chart, filename)
-        img_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        self._make_square_padding(
-            img_path,
-            size=self.width,
-            overlay_rgba=bgcolor,
-            overlay_opacity=0.15
-        )
+        filename = self._output_name("StackedBar", seed,
+                                     num_series=num_series, num_categories=num_categories,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_chart(chart), filename, overlay_rgba=synth["bgcolor"], overlay_opacity=0.15)
 
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "stacked_bar",
-            "max_category": max_cat,
-            "variation": {
-                "color_scheme": color_scheme,
-                "num_series": num_series,
-                "num_categories": num_categories
-            },
+            "max_category": synth["max_category"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": max_cat
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename
@@ -0,0 +1,116 @@
+from typing import Any, Callable, Iterable, List, Sequence, Union
+import numpy as np
+import pandas as pd
+
+# Vectorized data synthesis shared by the generators.
+#
+# Every generator draws its data table from data_rng(seed), a numpy Generator
+# dedicated to that seed, while variation choices (colors, sort, orientation,
+# ...) keep coming from the generator's random.Random(seed). Data is therefore
+# a pure function of the seed, and bulk() can synthesize thousands of seeds in
+# one call with exactly the values each single-seed call would produce.
+
+
+def data_rng(seed: int) -> np.random.Generator:
+    return np.random.default_rng(seed)
+
+
+def randint(rng: np.random.Generator, low: int, high: int, size) -> np.ndarray:
+    """Integers in [low, high], both ends inclusive like random.randint."""
+    return rng.integers(low, high + 1, size=size)
+
+
+def value_table(rng: np.random.Generator, labels: Sequence[Any], low: int = 10, high: int = 100,
+                label_col: str = "Category", value_col: str = "Value") -> pd.DataFrame:
+    """One random integer value per label."""
+    return pd.DataFrame({label_col: list(labels), value_col: randint(rng, low, high, len(labels))})
+
+
+def series_table(rng: np.random.Generator, outer: Sequence[Any], inner: Sequence[Any],
+                 low: int, high: int, columns=("category", "series", "value")) -> pd.DataFrame:
+    """Long-format table with one random integer per (outer, inner) pair, outer-major."""
+    outer_col, inner_col, value_col = columns
+    return pd.DataFrame({
+        outer_col: np.repeat(np.asarray(outer, dtype=object), len(inner)),
+        inner_col: np.tile(np.asarray(inner, dtype=object), len(outer)),
+        value_col: randint(rng, low, high, len(outer) * len(inner))
+    })
+
+
+def proportion_table(rng: np.random.Generator, categories: Sequence[Any], series: Sequence[Any],
+                     low: int = 1, high: int = 100) -> pd.DataFrame:
+    """Like series_table, with each category's values normalized to sum to 1."""
+    raw = randint(rng, low, high, (len(categories), len(series)))
+    shares = raw / raw.sum(axis=1, keepdims=True)
+    return pd.DataFrame({
+        "category": np.repeat(np.asarray(categories, dtype=object), len(series)),
+        "series": np.tile(np.asarray(series, dtype=object), len(categories)),
+        "value": shares.ravel()
+    })
+
+
+# Series longer than this are synthesized as random walks by the line and area generators
+LONG_SERIES = 1000
+
+
+def walk(rng: np.random.Generator, n: int, low: int, high: int) -> np.ndarray:
+    """Gaussian random walk of n values, rescaled to span [low, high]."""
+    steps = rng.normal(0, 1, n).cumsum()
+    span = (steps.max() - steps.min()) or 1.0
+    return low + (steps - steps.min()) / span * (high - low)
+
+
+def sample(rng: np.random.Generator, distribution: str, n: int) -> np.ndarray:
+    if distribution == "gaussian":
+        return rng.normal(50, 15, n)
+    elif distribution == "uniform":
+        return rng.uniform(0, 100, n)
+    elif distribution == "exponential":
+        return rng.exponential(30, n)
+    elif distribution == "bimodal":
+        half = n // 2
+        return np.concatenate([rng.normal(30, 5, half), rng.normal(70, 5, n - half)])
+    raise ValueError(f"Unsupported distribution type: {distribution}")
+
+
+def bulk(fn: Callable[..., Any], seeds: Iterable[int], *args, **kwargs) -> Union[np.ndarray, List[Any]]:
+    """Run a synthesis function for many seeds at once.
+
+    Returns a stacked (len(seeds), ...) array when fn returns arrays, e.g.
+    bulk(randint, range(10000), 10, 100, 4), and a list otherwise.
+    """
+    results = [fn(data_rng(seed), *args, **kwargs) for seed in seeds]
+    if results and all(isinstance(r, np.ndarray) for r in results):
+        return np.stack(results)
+    return results
+
+
+def histogram_table(values: np.ndarray, max_bins: int) -> pd.DataFrame:
+    """Counts per bin in one pass: at most max_bins equal bins, with round edges where they fit.
+
+    Bins are [start, end) except the last one, which also holds the maximum.
+    """
+    lo, hi = float(values.min()), float(values.max())
+    raw = (hi - lo) / max_bins if hi > lo else 1.0
+    magnitude = 10 ** np.floor(np.log10(raw))
+    # the smallest 1, 2, 2.5 or 5 times a power of ten that needs no more than max_bins
+    for step in (m * magnitude for m in (1, 2, 2.5, 5, 10, 20)):
+        start = np.floor(lo / step) * step
+        num_bins = max(int(np.ceil(round((hi - start) / step, 9))), 1)
+        if num_bins <= max_bins:
+            end = start + num_bins * step
+            break
+    else:
+        # round edges can't fit, e.g. a single bin across zero: max_bins bins from the minimum to the maximum
+        start, end, num_bins = lo, hi, max_bins
+    # uniform bins over a given range take numpy's fast path, no per-value search
+    counts, edges = np.histogram(values, bins=num_bins, range=(start, end))
+    edges = edges.round(9)
+    labels = [f"[{a:g}, {b:g})" for a, b in zip(edges[:-2], edges[1:-1])]
+    labels.append(f"[{edges[-2]:g}, {edges[-1]:g}]")
+    return pd.DataFrame({
+        "bin": labels,
+        "bin_start": edges[:-1],
+        "bin_end": edges[1:],
+        "count": counts
+    })
@@ -3,28 +3,52 @@ import random
 import json
 import pandas as pd
 import plotly.express as px
-from typing import Optional
+from typing import Optional, Dict, Any
 from generators.generator import ChartGenerator
+from generators.synthesis import data_rng, value_table
 
 class TreeMapGenerator(ChartGenerator):
-    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 500, height: int = 500):
-        super().__init__(output_dir, img_format, width, height)
+    name = "treemap"
+    size_param = "num_categories"
+    defaults = {"width": 500, "height": 500}
+    backend = "kaleido"
+    qa_columns = ("category", "value")
 
-    def generate(self, seed: int = 0, num_categories: int = 6,
-                 question_template: Optional[str] = "Which category occupies the largest area?",
-                 **kwargs):
-        random.seed(seed)
-        bgcolor = self._random_rgba()
+    def __init__(self, output_dir: str = "./charts", img_format: str = "png", width: int = 500, height: int = 500,
+                 sink=None, sizes=()):
+        super().__init__(output_dir, img_format, width, height, sink, sizes=sizes)
+
+    def synthesize(self, seed: int = 0, num_categories: int = 6, **kwargs) -> Dict[str, Any]:
+        rng = random.Random(seed)
+        np_rng = data_rng(seed)
+        bgcolor = self._random_rgba(rng)
 
-        values_label = kwargs.get("y_label") or "Value"
-        title = kwargs.get("title") or f"Tree map of {values_label}"
         categories = kwargs.get("categories") or [chr(65+i) for i in range(num_categories)]
         if (len(categories) != num_categories):
             categories = [chr(65+i) for i in range(num_categories)]
         
-        values = [random.randint(10, 100) for _ in categories]
-        df = pd.DataFrame({'category': categories, 'value': values})
+        df = value_table(np_rng, categories, 10, 100, label_col='category', value_col='value')
         max_category = df.loc[df['value'].idxmax(), 'category']
+        return {
+            "data": df,
+            "bgcolor": bgcolor,
+            "max_category": max_category,
+            "variation": {
+                "num_categories": num_categories,
+                "background_color": bgcolor
+            },
+            "answer": max_category
+        }
+
+    def generate(self, seed: int = 0, num_categories: int = 6,
+                 question_template: Optional[str] = "Which category occupies the largest area?",
+                 **kwargs):
+        synth = self.synthesize(seed=seed, num_categories=num_categories, **kwargs)
+        df = synth["data"]
+        bgcolor = synth["bgcolor"]
+
+        values_label = kwargs.get("y_label") or "Value"
+        title = kwargs.get("title") or f"Tree map of {values_label}"
 
         fig = px.treemap(
             df,
@@ -50,26 +74,18 @@ class TreeMapGenerator(ChartGenerator):
             margin=dict(l=0, r=0, t=40, b=0)
         )
 
-        filename = f"TreeMap"
-        save_path = os.path.join(self.output_dir, f"{filename}.{self.img_format}")
-        fig.write_image(save_path, width=self.width, height=self.height)
-
-        self._make_square_padding(
-            save_path,
-            size=self.width,
-            overlay_rgba=None
-        )
+        filename = self._output_name("TreeMap", seed,
+                                     num_categories=num_categories,
+                                     question_template=question_template, **kwargs)
+        self._save_images(self._render_figure(fig), filename, overlay_rgba=None)
 
         metadata = {
             "filename": f"{filename}.{self.img_format}",
             "chart_type": "treemap",
-            "max_category": max_category,
-            "variation": {
-                "num_categories": num_categories,
-                "background_color": bgcolor
-            },
+            "max_category": synth["max_category"],
+            "variation": synth["variation"],
             "question": question_template,
-            "answer": max_category
+            "answer": synth["answer"]
         }
         self._save_metadata(metadata, filename)
         return filename